@@ -0,0 +1,272 @@
+# junox/api_cache.py
+"""
+Response cache for read-mostly backend endpoints (inventory, VLAN catalog,
+jobs, dashboard stats), stored in Django's cache framework.
+
+- Each endpoint group has its own TTL (settings.API_CACHE_TTLS); groups
+  without a TTL are fetched straight through.
+- Entries are scoped per user (the token's subject), so one user's cached
+  answer is never served to another. The only exception is opt-in: with a
+  service account configured, the groups in settings.API_CACHE_SHARED_GROUPS
+  are cached once for everyone (and cache_warmer.py keeps them fresh).
+- Expired entries are kept a while longer; when the backend sent an ETag we
+  revalidate with If-None-Match and a 304 just extends the entry.
+- Writes call invalidate() for the groups they change, which bumps a
+  per-group generation number and orphans every user's entry at once.
+- While the backend can't be reached (or its circuit breaker is open) an
+  expired entry is served as is, marked stale, instead of failing the page.
+- remember() files a response under another request's key as well, for a
+  backend found to ignore the parameters it was sent.
+
+acached_get() and aremember() are the same cache for the async service layer.
+"""
+import hashlib
+import logging
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+import requests
+
+from .api_client import api_get, get_budget
+from .async_client import TRANSPORT_ERRORS, api_aget
+from .concurrency import AsyncSingleFlight, SingleFlight
+from . import metrics, tokens
+
+logger = logging.getLogger(__name__)
+
+_fetches = SingleFlight()
+_afetches = AsyncSingleFlight()
+
+
+class FetchWaitTimeout(requests.exceptions.Timeout):
+    """
+    Raised to a request that gave up waiting for another request's fetch of
+    the same entry. A requests Timeout, so every "backend unreachable" path
+    handles it.
+    """
+
+
+class CachedResponse:
+    """What a cached GET returns: status code, parsed JSON and a data version."""
+
+    def __init__(self, status_code, data=None, version=None, from_cache=False, stale=False):
+        self.status_code = status_code
+        self.data = data
+        self.version = version
+        self.from_cache = from_cache
+        self.stale = stale  # Expired entry served because the backend is unavailable
+
+    @property
+    def ok(self):
+        return self.status_code == 200
+
+
+def _ttl(group):
+    return getattr(settings, 'API_CACHE_TTLS', {}).get(group, 0)
+
+
+def _generation_key(group):
+    return f'junox:api:gen:{group}'
+
+
+def invalidate(*groups):
+    """Drops every cached response of the given endpoint groups, for all users."""
+    for group in groups:
+        key = _generation_key(group)
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Evicted between add() and incr()
+                cache.set(key, 1, timeout=None)
+
+
+@lru_cache(maxsize=1024)
+def _scope(token):
+    return hashlib.sha256((tokens.token_subject(token) or token or '').encode()).hexdigest()[:16]
+
+
+def _shared(group):
+    # Both have to be configured: sharing is never on by default
+    return (group in getattr(settings, 'API_CACHE_SHARED_GROUPS', ())
+            and bool(getattr(settings, 'JUNOX_SERVICE_USERNAME', None)))
+
+
+def _cache_key(group, generation, url, params, token):
+    request_id = hashlib.sha256(repr((url, sorted((params or {}).items()))).encode()).hexdigest()[:24]
+    scope = 'shared' if _shared(group) else _scope(token)
+    return f'junox:api:{group}:{generation}:{scope}:{request_id}'
+
+
+def _entry_timeout(group):
+    return _ttl(group) + getattr(settings, 'API_CACHE_STALE_SECONDS', 600)
+
+
+def _revalidation_headers(entry):
+    if entry and entry.get('etag'):
+        return {'If-None-Match': entry['etag']}
+    return {}
+
+
+def _fresh(entry, fresh_for=0):
+    if entry and entry['expires'] > time.time() + fresh_for:
+        return CachedResponse(200, entry['data'], entry['version'], from_cache=True)
+    return None
+
+
+def _count(group, result):
+    # 'hit' (fresh), 'revalidated' (304 from FastAPI), 'stale' (backend down),
+    # 'miss' or 'bypass' (group not cached)
+    if result is None:
+        outcome = 'bypass'
+    elif result.stale:
+        outcome = 'stale'
+    elif result.from_cache:
+        outcome = 'revalidated'
+    else:
+        outcome = 'miss'
+    metrics.count_cache(group, outcome)
+    return result
+
+
+def _uncached(response):
+    if response.status_code != 200:
+        return CachedResponse(response.status_code)
+    return CachedResponse(200, response.json(), hashlib.sha1(response.content).hexdigest())
+
+
+def _absorb(group, entry, response):
+    """
+    Turns a backend response into (CachedResponse, entry to store or None).
+    Shared by the sync and async paths, which only differ in how they do I/O.
+    """
+    now = time.time()
+
+    if response.status_code == 304 and entry:
+        entry['expires'] = now + _ttl(group)
+        return CachedResponse(200, entry['data'], entry['version'], from_cache=True), entry
+
+    if response.status_code >= 500 and entry:
+        return _stale(entry), None
+
+    if response.status_code != 200:
+        return CachedResponse(response.status_code), None
+
+    data = response.json()
+    etag = response.headers.get('ETag')
+    version = etag or hashlib.sha1(response.content).hexdigest()
+    entry = {'data': data, 'etag': etag, 'version': version, 'expires': now + _ttl(group)}
+    return CachedResponse(200, data, version), entry
+
+
+def _stale(entry):
+    # Counted as 'stale' in junox_cache_requests_total; debug level, as it happens on every lookup of an outage
+    logger.debug("API unavailable, serving a stale cache entry")
+    return CachedResponse(200, entry['data'], entry['version'], from_cache=True, stale=True)
+
+
+def _fetch(key, entry, group, url, token, params, timeout):
+    try:
+        response = api_get(url, token=token, params=params, headers=_revalidation_headers(entry), timeout=timeout)
+    except requests.exceptions.RequestException:
+        if entry:
+            return _stale(entry)
+        raise
+    result, entry = _absorb(group, entry, response)
+    if entry is not None:
+        cache.set(key, entry, _entry_timeout(group))
+    return result
+
+
+def _remembered(group, response):
+    # No ETag: the copy is refetched in full once it expires, then revalidates normally
+    return {'data': response.data, 'etag': None, 'version': response.version, 'expires': time.time() + _ttl(group)}
+
+
+def remember(group, url, response, token=None, params=None):
+    """
+    Stores `response`, a CachedResponse fetched with different parameters,
+    as the answer to GET `url` with `params` too, unless that is cached
+    already. For a backend that turned out to ignore the parameters sent:
+    the request without them then doesn't download the same data again.
+    """
+    if not _ttl(group) or not response.ok or response.stale:
+        return
+    key = _cache_key(group, cache.get(_generation_key(group), 0), url, params or None, token)
+    cache.add(key, _remembered(group, response), _entry_timeout(group))
+
+
+async def aremember(group, url, response, token=None, params=None):
+    """Async version of remember()."""
+    if not _ttl(group) or not response.ok or response.stale:
+        return
+    key = _cache_key(group, await cache.aget(_generation_key(group), 0), url, params or None, token)
+    await cache.aadd(key, _remembered(group, response), _entry_timeout(group))
+
+
+def cached_get(group, url, token=None, params=None, timeout=None, fresh_for=0):
+    """
+    GETs `url` through the response cache of endpoint `group`.
+
+    Returns a CachedResponse; raises requests exceptions like api_get() when
+    the backend has to be asked and can't be reached. With `fresh_for` an
+    entry that expires within that many seconds is refetched (revalidated
+    by ETag) already, which is how the cache warmer stays ahead of users.
+    """
+    params = params or None
+
+    if not _ttl(group):
+        _count(group, None)
+        return _uncached(api_get(url, token=token, params=params, timeout=timeout))
+
+    key = _cache_key(group, cache.get(_generation_key(group), 0), url, params, token)
+    entry = cache.get(key)
+    fresh = _fresh(entry, fresh_for)
+    if fresh is not None:
+        metrics.count_cache(group, 'hit')
+        return fresh
+
+    # One refetch per key per process, however many requests missed together.
+    # Waiters allow for the fetch's retries; past that they fall back like on any timeout
+    try:
+        result = _fetches.do(key, _fetch, key, entry, group, url, token, params, timeout,
+                             timeout=get_budget(timeout))
+    except TimeoutError:
+        if not entry:
+            raise FetchWaitTimeout(f"Gave up waiting for the in-flight fetch of {url}")
+        result = _stale(entry)
+    return _count(group, result)
+
+
+async def _afetch(key, entry, group, url, token, params, timeout):
+    try:
+        response = await api_aget(url, token=token, params=params, headers=_revalidation_headers(entry), timeout=timeout)
+    except TRANSPORT_ERRORS:
+        if entry:
+            return _stale(entry)
+        raise
+    result, entry = _absorb(group, entry, response)
+    if entry is not None:
+        await cache.aset(key, entry, _entry_timeout(group))
+    return result
+
+
+async def acached_get(group, url, token=None, params=None, timeout=None):
+    """Async version of cached_get(), for the async service layer."""
+    params = params or None
+
+    if not _ttl(group):
+        _count(group, None)
+        return _uncached(await api_aget(url, token=token, params=params, timeout=timeout))
+
+    key = _cache_key(group, await cache.aget(_generation_key(group), 0), url, params, token)
+    entry = await cache.aget(key)
+    fresh = _fresh(entry)
+    if fresh is not None:
+        metrics.count_cache(group, 'hit')
+        return fresh
+
+    return _count(group, await _afetches.do(key, _afetch, key, entry, group, url, token, params, timeout))
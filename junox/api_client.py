@@ -0,0 +1,165 @@
+# junox/api_client.py
+"""
+Shared HTTP client for every call the frontend makes to the FastAPI backend.
+
+One connection pool (urllib3, via a requests HTTPAdapter) is kept per worker
+process, so backend hops reuse keep-alive connections instead of opening a
+fresh TCP connection per call. Each thread gets its own requests.Session
+mounted on that shared adapter, so the sessions are never shared between
+threads while the sockets themselves are pooled. A thread serves many
+users, so the sessions refuse cookies: a backend Set-Cookie for one user
+must never ride along on the next user's calls.
+
+Only idempotent GETs are retried (with exponential backoff); POSTs such as
+provisioning or VLAN assignment are never replayed.
+"""
+import os
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+from . import metrics
+from .breaker import breaker_for
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ApiClient:
+    def __init__(self):
+        self.pool_connections = _setting('API_POOL_CONNECTIONS', 10)
+        self.pool_maxsize = _setting('API_POOL_MAXSIZE', 20)
+        self.connect_timeout = _setting('API_CONNECT_TIMEOUT', 2)
+        self.read_timeout = _setting('API_READ_TIMEOUT', 10)
+
+        self._local = threading.local()
+        self._get_adapter = self._build_adapter(retries=_setting('API_GET_RETRIES', 2))
+        self._write_adapter = self._build_adapter(retries=0)
+
+    def _build_adapter(self, retries):
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=_setting('API_RETRY_BACKOFF', 0.2),
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        return HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+        )
+
+    def _session(self, idempotent):
+        """Returns this thread's session for GETs or for writes."""
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = {}
+            for key, adapter in (('get', self._get_adapter), ('write', self._write_adapter)):
+                session = requests.Session()
+                # No domain is allowed to set cookies (see the module docstring)
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                sessions[key] = session
+            self._local.sessions = sessions
+        return sessions['get' if idempotent else 'write']
+
+    def _timeout(self, timeout):
+        # A bare number from a caller is the read timeout; connecting should
+        # always fail fast so a dead backend doesn't hold a worker.
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, (int, float)):
+            return (min(self.connect_timeout, timeout), timeout)
+        return timeout
+
+    def get_budget(self, timeout=None):
+        """
+        Worst-case seconds a GET with `timeout` can take: every attempt
+        (retries included) running into its timeouts, plus the backoff
+        sleeps between attempts. What waiting on someone else's GET has to allow.
+        """
+        connect, read = self._timeout(timeout)
+        retry = self._get_adapter.max_retries
+        backoff = sum(min(retry.backoff_factor * 2 ** n, retry.DEFAULT_BACKOFF_MAX) for n in range(retry.total))
+        return (retry.total + 1) * (connect + read) + backoff
+
+    def request(self, method, url, token=None, headers=None, timeout=None, **kwargs):
+        method = method.upper()
+        headers = dict(headers or {})
+        if token:
+            headers.setdefault('Authorization', f'Bearer {token}')
+
+        # Fails right here, without touching the network, while the group's breaker is open
+        breaker = breaker_for(url, method)
+        breaker.before_call()
+
+        session = self._session(idempotent=method in ('GET', 'HEAD'))
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = session.request(method, url, headers=headers, timeout=self._timeout(timeout), **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            # Retries included: this is what the view waited for
+            metrics.observe_backend(method, url, time.perf_counter() - started, status)
+            breaker.record(status != 'error' and status < 500)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self._get_adapter.close()
+        self._write_adapter.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide ApiClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ApiClient()
+    return _client
+
+
+def _reset_after_fork():
+    # Pooled sockets must never be shared between a parent and forked
+    # worker (gunicorn --preload), so each child starts with a fresh pool.
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def api_get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+
+def get_budget(timeout=None):
+    return get_client().get_budget(timeout)
+
+
+def api_post(url, **kwargs):
+    return get_client().post(url, **kwargs)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class JunoxConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'junox'
+
+    def ready(self):
+        # Background cache warming, if CACHE_WARM_IN_PROCESS is on (cache_warmer.py)
+        from .cache_warmer import start_in_process
+        start_in_process()
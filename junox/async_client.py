@@ -0,0 +1,143 @@
+# junox/async_client.py
+"""
+Async counterpart of api_client for the ASGI deployment.
+
+Uses one pooled httpx.AsyncClient per event loop (httpx clients can't be
+shared between loops), with the same pool size, timeouts and GET-only
+retry policy as the sync client, so one worker can keep hundreds of backend
+calls in flight without a thread per call.
+
+httpx is optional: without it every call runs the sync client in a worker
+thread, which works but brings back the thread-per-call cost.
+"""
+import asyncio
+import time
+import weakref
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics
+from .api_client import get_client
+from .breaker import breaker_for
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - depends on the deployment
+    httpx = None
+
+# Exceptions meaning "the backend couldn't be reached", whichever transport ran
+if httpx is not None:
+    TRANSPORT_ERRORS = (requests.exceptions.RequestException, httpx.HTTPError)
+else:
+    TRANSPORT_ERRORS = (requests.exceptions.RequestException,)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AsyncApiClient:
+    def __init__(self):
+        self.connect_timeout = _setting('API_CONNECT_TIMEOUT', 2)
+        self.read_timeout = _setting('API_READ_TIMEOUT', 10)
+        self.retries = _setting('API_GET_RETRIES', 2)
+        self.backoff = _setting('API_RETRY_BACKOFF', 0.2)
+
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=_setting('API_POOL_MAXSIZE', 20),
+                max_keepalive_connections=_setting('API_POOL_MAXSIZE', 20),
+            ),
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+        )
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+        if isinstance(timeout, (int, float)):
+            return httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout))
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+
+    async def request(self, method, url, token=None, headers=None, timeout=None, **kwargs):
+        method = method.upper()
+        headers = dict(headers or {})
+        if token:
+            headers.setdefault('Authorization', f'Bearer {token}')
+
+        # Same policy as the sync client: only idempotent calls are retried
+        attempts = 1 + (self.retries if method in ('GET', 'HEAD') else 0)
+        breaker = breaker_for(url, method)
+        breaker.before_call()
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            for attempt in range(attempts):
+                try:
+                    response = await self._client.request(
+                        method, url, headers=headers, timeout=self._timeout(timeout), **kwargs)
+                    if response.status_code in (502, 503, 504) and attempt < attempts - 1:
+                        raise httpx.HTTPStatusError('retryable status', request=response.request, response=response)
+                    status = response.status_code
+                    return response
+                except (httpx.TransportError, httpx.HTTPStatusError):
+                    if attempt == attempts - 1:
+                        raise
+                    await asyncio.sleep(self.backoff * (2 ** attempt))
+        finally:
+            metrics.observe_backend(method, url, time.perf_counter() - started, status)
+            breaker.record(status != 'error' and status < 500)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class _ThreadedApiClient:
+    """Fallback without httpx: the pooled sync client, run off the event loop."""
+
+    async def request(self, method, url, **kwargs):
+        return await sync_to_async(get_client().request, thread_sensitive=False)(method, url, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def aclose(self):
+        pass
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Returns the AsyncApiClient of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncApiClient() if httpx is not None else _ThreadedApiClient()
+    return client
+
+
+async def close_async_client():
+    """Closes the running loop's client, for loops that are about to end (sse.iterate_blocking)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def api_aget(url, **kwargs):
+    return await get_async_client().get(url, **kwargs)
+
+
+async def api_apost(url, **kwargs):
+    return await get_async_client().post(url, **kwargs)
@@ -0,0 +1,128 @@
+# junox/async_services.py
+"""
+Async versions of the read-only calls in services.py, for the async views.
+
+Same names, arguments and return values as their sync counterparts; they
+share the response cache and the result shaping, and only differ in doing
+their I/O on the event loop (async_client / acached_get).
+"""
+import logging
+
+from .api_cache import CachedResponse, acached_get, aremember
+from .async_client import TRANSPORT_ERRORS
+from .services import (
+    API_URL,
+    _device_page_from,
+    _device_page_query,
+    _ignored_paging,
+    _job_changes_from,
+    _job_changes_query,
+    _jobs_page_from,
+    _jobs_page_query,
+    _jobs_server_paging,
+    _server_paging,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def _fetch_devices(token, **query):
+    url = f"{API_URL}/devices"
+    params = {key: value for key, value in query.items() if value not in (None, '')}
+
+    try:
+        response = await acached_get('devices', url, token=token, params=params, timeout=5)
+        if response.ok:
+            return response
+        return CachedResponse(response.status_code, [])
+    except TRANSPORT_ERRORS as e:
+        logger.warning("API error: %s", e)
+        return None
+
+
+async def get_device_page(token, search='', offset=0, limit=15, sort=None, cursor=None):
+    sort, query = _device_page_query(search, offset, limit, sort, cursor)
+    response = await _fetch_devices(token, **query)
+    if _ignored_paging(query, response, _server_paging):
+        await aremember('devices', f"{API_URL}/devices", response, token=token)
+    return _device_page_from(response, search, offset, limit, sort)
+
+
+async def get_device_interfaces(token, device_id):
+    url = f"{API_URL}/interfaces/{device_id}/interfaces_db"
+
+    try:
+        response = await acached_get('interfaces', url, token=token, timeout=5)
+        if response.ok:
+            return dict(response.data, version=response.version)
+        return None
+    except TRANSPORT_ERRORS as e:
+        logger.warning("API error: %s", e)
+        return None
+
+
+async def service_get_device_vlans(token, device_id):
+    url = f"{API_URL}/vlans/{device_id}/fetch_vlans_db"
+
+    try:
+        response = await acached_get('device_vlans', url, token=token, timeout=5)
+        if response.ok:
+            return response.data
+        return None
+    except TRANSPORT_ERRORS as e:
+        logger.warning("API error: %s", e)
+        return None
+
+
+async def service_get_vlan_catalog(token):
+    url = f"{API_URL}/vlans/get_vlan_catalog_db"
+
+    try:
+        response = await acached_get('vlan_catalog', url, token=token, timeout=10)
+        if response.ok:
+            return {"success": True, "vlans": response.data, "version": response.version}
+        return {"success": False, "error": "Failed to fetch VLAN catalog"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+async def service_get_jobs_page(token, search='', sort='created_at', order='desc', offset=0, limit=15):
+    sort, order, params = _jobs_page_query(search, sort, order, offset, limit)
+    url = f"{API_URL}/other/jobs/all"
+
+    try:
+        response = await acached_get('jobs', url, token=token, params=params, timeout=10)
+        if not response.ok:
+            return {"success": False, "error": "Failed to fetch jobs"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    if _ignored_paging(params, response, _jobs_server_paging):
+        await aremember('jobs', url, response, token=token)
+    return _jobs_page_from(response, search, sort, order, offset, limit)
+
+
+async def service_get_job_changes(token, ids=(), since=None):
+    params = _job_changes_query(ids, since)
+    url = f"{API_URL}/other/jobs/all"
+
+    try:
+        response = await acached_get('job_changes', url, token=token, params=params, timeout=10)
+        if not response.ok:
+            return {"success": False, "error": "Failed to fetch jobs"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    return {"success": True, "jobs": _job_changes_from(response, ids, since, params)}
+
+
+async def service_get_inventory_stats(token):
+    url = f"{API_URL}/devices/inventory/stats"
+
+    try:
+        response = await acached_get('stats', url, token=token, timeout=3)
+        if response.ok:
+            return {"success": True, "stats": response.data, "version": response.version}
+        return {"success": False, "error": f"Error fetching stats: {response.status_code}"}
+    except TRANSPORT_ERRORS as e:
+        return {"success": False, "error": f"API Connection Error: {e}"}
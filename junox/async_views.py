@@ -0,0 +1,189 @@
+# junox/async_views.py
+"""
+Async versions of the read-heavy pages, used instead of the ones in
+views.py when JUNOX_ASYNC_VIEWS is on (ASGI deployments).
+
+Backend calls are awaited on the event loop through async_services, so a
+worker waiting on FastAPI for hundreds of page loads doesn't need hundreds
+of threads. Everything after the backend calls (paging, context, template)
+is shared with the sync views. Rendering runs in a thread (sync_to_async):
+the context processors and {% cache %} blocks read the session, the cache
+and, for the API version, the backend, none of which may block the loop.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseBadRequest, HttpResponseForbidden
+from django.shortcuts import redirect, render
+
+from . import async_services, bulk_import, job_stream, log_relay, sse
+from .concurrency import agather
+from .pagination import PageWindow, page_number
+from . import views
+from .views import DEVICE_VLANS_LAZY, _device_page_window, _device_vlans_response
+
+_render_dashboard = sync_to_async(views._render_dashboard)
+_render_device_dashboard = sync_to_async(views._render_device_dashboard)
+_render_device_detail = sync_to_async(views._render_device_detail)
+_render_jobs_list = sync_to_async(views._render_jobs_list)
+_render_vlan_catalog = sync_to_async(views._render_vlan_catalog)
+
+
+#DECORATOR
+def token_required(view_func):
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        # Loads the session off the event loop if the middleware hasn't already;
+        # after this the views can read request.session directly
+        if not await sync_to_async(request.session.get)('auth_token'):
+            return redirect('junox:login_junox')
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+@token_required
+async def dashboard_view(request):
+    token = request.session.get('auth_token')
+    result = await async_services.service_get_inventory_stats(token)
+    return await _render_dashboard(request, result)
+
+
+@token_required
+async def device_dashboard_view(request):
+    token = request.session.get('auth_token')
+
+    search_query = request.GET.get('q', '').strip()
+    sort = request.GET.get('sort', '').strip()
+    cursor = request.GET.get('cursor') or None
+    current_page = page_number(request)
+
+    items_per_page = 15
+
+    page_data = await async_services.get_device_page(
+        token, search=search_query, sort=sort, cursor=cursor,
+        offset=(current_page - 1) * items_per_page, limit=items_per_page)
+
+    if page_data is None:
+        return await _render_device_dashboard(request, None, None, search_query, sort)
+
+    page = _device_page_window(request, page_data, current_page, items_per_page)
+    if page.number != current_page and not page.is_cursor:
+        page_data = await async_services.get_device_page(
+            token, search=search_query, sort=sort, offset=page.offset, limit=items_per_page) or page_data
+
+    return await _render_device_dashboard(request, page_data, page, search_query, sort)
+
+
+@token_required
+async def device_detail_view(request, device_id, hostname):
+    token = request.session.get('auth_token')
+
+    if DEVICE_VLANS_LAZY:
+        interfaces = await async_services.get_device_interfaces(token, device_id)
+        return await _render_device_detail(request, device_id, hostname, interfaces, None)
+
+    results = await agather({
+        'interfaces': (async_services.get_device_interfaces, token, device_id),
+        'vlans': (async_services.service_get_device_vlans, token, device_id),
+    })
+    return await _render_device_detail(request, device_id, hostname, results['interfaces'], results['vlans'])
+
+
+@token_required
+async def device_vlans_view(request, device_id):
+    token = request.session.get('auth_token')
+    return _device_vlans_response(request, await async_services.service_get_device_vlans(token, device_id))
+
+
+@token_required
+async def jobs_list_view(request):
+    token = request.session.get('auth_token')
+
+    search_query = request.GET.get('q', '').lower()
+    sort_by = request.GET.get('sort', 'created_at')
+    order = request.GET.get('order', 'desc')
+
+    items_per_page = 15
+    current_page = page_number(request)
+    result = await async_services.service_get_jobs_page(
+        token, search=search_query, sort=sort_by, order=order,
+        offset=(current_page - 1) * items_per_page, limit=items_per_page)
+
+    page = PageWindow(request, items_per_page, number=current_page, total=result.get('total', 0))
+    if result.get('success') and page.number != current_page:
+        result = await async_services.service_get_jobs_page(
+            token, search=search_query, sort=sort_by, order=order,
+            offset=page.offset, limit=items_per_page)
+
+    return await _render_jobs_list(request, result, page, search_query, sort_by, order)
+
+
+@token_required
+async def vlan_catalog_view(request):
+    token = request.session.get('auth_token')
+    result = await async_services.service_get_vlan_catalog(token)
+    return await _render_vlan_catalog(request, result)
+
+
+@token_required
+async def device_log_stream_view(request, session_id):
+    """
+    Server-Sent Events relay of a provisioning session's live log (add_device
+    debug mode). Always async, whatever JUNOX_ASYNC_VIEWS says.
+    """
+    session_id = str(session_id)
+    if session_id not in request.session.get('log_sessions', []):
+        return HttpResponseForbidden()
+
+    frames = log_relay.stream_session_logs(session_id, request.session.get('auth_token'))
+    return sse.stream_response(request, frames)
+
+
+@token_required
+async def jobs_stream_view(request):
+    """
+    Server-Sent Events with job status changes, for the job ids in ?ids=a,b
+    and/or every job changed after ?since=<epoch seconds> (or Last-Event-ID
+    on reconnect). Always async, like device_log_stream_view.
+
+    ASGI only: under WSGI the stream would hold a worker thread for as long
+    as the page is open, so the pages poll jobs_status there instead.
+    """
+    if not sse.streams_supported(request):
+        return HttpResponseBadRequest("Job streams need an ASGI server, poll jobs/status/ instead")
+
+    ids, since = job_stream.job_query(request)
+    if not ids and since is None:
+        return HttpResponseBadRequest("Pass ids and/or since")
+
+    frames = job_stream.stream_job_updates(request.session.get('auth_token'), ids, since)
+    return sse.stream_response(request, frames)
+
+
+@token_required
+async def bulk_add_device_view(request):
+    """
+    Bulk import: GET shows the form, POST (from the page's fetch) streams one
+    Server-Sent Event per row while the devices are provisioned. Always async,
+    like the other streams.
+    """
+    if request.method != 'POST':
+        return await sync_to_async(render)(request, 'junox/bulk_add_device.html')
+
+    # Parsing the multipart body touches the (possibly spooled) upload
+    upload, text, username, password = await sync_to_async(_bulk_input)(request)
+    if upload is None and not text.strip():
+        return HttpResponseBadRequest("Upload a CSV file or paste at least one device")
+
+    rows = bulk_import.parse_rows(bulk_import.input_lines(upload, text), username, password)
+    frames = bulk_import.provision_rows(request.session.get('auth_token'), rows)
+    return sse.stream_response(request, frames)
+
+
+def _bulk_input(request):
+    return (
+        request.FILES.get('csv_file'),
+        request.POST.get('rows', ''),
+        request.POST.get('username', '').strip(),
+        request.POST.get('password', ''),
+    )
@@ -0,0 +1,126 @@
+# junox/breaker.py
+"""
+Circuit breakers around the backend, one per endpoint group, with writes
+kept apart from reads.
+
+After BREAKER_FAILURES failed calls in a row (connection errors, timeouts,
+5xx) a group's breaker opens and calls to it fail at once with
+BackendUnavailable instead of tying up a worker for the full timeout. After
+BREAKER_RESET_SECONDS one call is let through as a probe (half-open): if it
+works the breaker closes, if not it stays open for another round.
+
+BackendUnavailable is a requests ConnectionError, so every existing "backend
+unreachable" path handles it, and the response cache answers from its
+expired entries meanwhile (api_cache). Breakers are per worker process;
+each one finds out about an outage by itself.
+"""
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+# Endpoints that belong together: /token, /refresh and /ping fail as one "auth" group
+GROUP_ALIASES = {
+    'token': 'auth',
+    'refresh': 'auth',
+    'ping': 'auth',
+    'other': 'jobs',
+}
+
+# Groups whose writes share the reads' breaker. Elsewhere writes get their own
+# ("devices (writes)"): provisioning a device that won't answer fails with a 5xx,
+# and that mustn't cut the inventory pages off from a healthy backend
+SHARED_WRITE_GROUPS = ('auth',)
+
+
+class BackendUnavailable(requests.exceptions.ConnectionError):
+    """Raised instead of calling the backend while a group's breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, group):
+        self.group = group
+        self.failures_to_open = getattr(settings, 'BREAKER_FAILURES', 5)
+        self.reset_seconds = getattr(settings, 'BREAKER_RESET_SECONDS', 30)
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        metrics.set_breaker_state(group, CLOSED)
+
+    def before_call(self):
+        """Raises BackendUnavailable unless the call may go through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                # This call is the probe; everyone else keeps failing fast until it's back
+                self._probing = True
+                return
+
+        metrics.count_breaker_rejection(self.group)
+        raise BackendUnavailable(f"Backend unavailable ({self.group}): circuit open")
+
+    def record(self, ok):
+        # ok: the backend answered, with anything but a 5xx (a 4xx is a healthy "no")
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.failures = 0
+                if self.state != CLOSED:
+                    logger.warning("Circuit breaker %s: backend is back, closing", self.group)
+                    self._set_state(CLOSED)
+                return
+
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failures_to_open:
+                if self.state != OPEN:
+                    logger.warning("Circuit breaker %s: %s failures, opening", self.group, self.failures)
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.set_breaker_state(self.group, state)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def group_for(url, method='GET'):
+    """
+    The endpoint group of a backend call: the URL's first path segment, with
+    GROUP_ALIASES applied, and a separate group for writes (see SHARED_WRITE_GROUPS).
+    """
+    segment = metrics.endpoint_path(url).strip('/').split('/', 1)[0] or 'root'
+    group = GROUP_ALIASES.get(segment, segment)
+    if method.upper() not in ('GET', 'HEAD') and group not in SHARED_WRITE_GROUPS:
+        return f'{group} (writes)'
+    return group
+
+
+def breaker_for(url, method='GET'):
+    group = group_for(url, method)
+    breaker = _breakers.get(group)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(group, CircuitBreaker(group))
+    return breaker
+
+
+def open_groups():
+    """Groups whose breaker isn't closed, for the degraded-mode banner."""
+    return sorted(group for group, breaker in _breakers.items() if breaker.state != CLOSED)
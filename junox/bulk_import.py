@@ -0,0 +1,195 @@
+# junox/bulk_import.py
+"""
+Bulk device provisioning: rows of hostname and credentials from an uploaded
+CSV or a pasted list, submitted to FastAPI's /devices/provision through a
+bounded, rate-limited pipeline, with each row's outcome (and job id) sent
+to the browser as Server-Sent Events while the import runs.
+
+Rows are parsed one at a time, and the next row is only read once a
+submission slot is free, so an import holds at most BULK_PROVISION_WORKERS
+rows in flight whatever the size of the file (Django spools large uploads
+to disk). Like the other streams it runs on the event loop; under WSGI it
+holds one worker thread for as long as the import runs.
+"""
+import asyncio
+import csv
+import io
+import json
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import sse
+from .api_cache import invalidate
+from .async_client import TRANSPORT_ERRORS, api_apost
+from .services import _provision_request, _provision_result
+
+logger = logging.getLogger(__name__)
+
+# Hostnames, IPv4 and IPv6 addresses; anything else can't be part of the provisioning URL
+HOSTNAME_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9.:-]{0,252}$')
+
+# First cells that mark a header row rather than a device
+HEADER_CELLS = ('hostname', 'host', 'ip', 'ip_address', 'address')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Row:
+    """One device to provision, with the line it came from and why it's invalid (if it is)."""
+
+    __slots__ = ('line', 'hostname', 'username', 'password', 'error')
+
+    def __init__(self, line, hostname, username, password, error=None):
+        self.line = line
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.error = error
+
+
+def input_lines(upload=None, text=''):
+    """Text lines of an uploaded CSV (read lazily from the upload) or of pasted text."""
+    if upload is not None:
+        # utf-8-sig drops the byte order mark Excel puts in front of its CSV exports
+        return io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+    return io.StringIO(text, newline='')
+
+
+def parse_rows(lines, username='', password=''):
+    """
+    Yields a Row per device in `lines` ("hostname[,username,password]").
+    Rows without credentials use `username`/`password`; blank lines,
+    '#' comments and a leading header row are skipped.
+    """
+    reader = csv.reader(lines, skipinitialspace=True)
+    seen = {} # hostname -> line, to catch the same device listed twice
+    first = True
+
+    for cells in reader:
+        cells = [cell.strip() for cell in cells]
+        if not any(cells) or cells[0].startswith('#'):
+            continue
+        if first:
+            first = False
+            if cells[0].lower() in HEADER_CELLS:
+                continue
+
+        line = reader.line_num
+        hostname, row_username, row_password = (cells + ['', ''])[:3]
+        row = Row(line, hostname, row_username or username, row_password or password)
+
+        if len(cells) > 3:
+            row.error = "Expected hostname[,username,password]"
+        elif not HOSTNAME_RE.match(hostname):
+            row.error = "Invalid hostname or IP address"
+        elif not row.username or not row.password:
+            row.error = "Missing username or password"
+        elif hostname.lower() in seen:
+            row.error = f"Duplicate of line {seen[hostname.lower()]}"
+        else:
+            seen[hostname.lower()] = line
+        yield row
+
+
+async def _submit(token, row):
+    url, payload = _provision_request(row.hostname, row.username, row.password)
+    headers = {'accept': 'application/json'}
+    try:
+        response = await api_apost(url, token=token, headers=headers, json=payload, timeout=15)
+        return row, _provision_result(response)
+    except TRANSPORT_ERRORS as e:
+        return row, {"success": False, "error": f"API Connection Error: {str(e)}"}
+    except Exception as e:
+        # One bad reply fails its row, never the whole import
+        logger.exception("Bulk import: provisioning %s failed", row.hostname)
+        return row, {"success": False, "error": f"Provisioning failed: {e}"}
+
+
+def _row_event(row, status, job_id=None, error=None):
+    return sse.event([json.dumps({
+        'line': row.line,
+        'hostname': row.hostname,
+        'status': status,
+        'job_id': job_id,
+        'error': error,
+    })], event='row')
+
+
+async def provision_rows(token, rows):
+    """
+    Async iterator of SSE frames: a 'row' event per row ('submitted' with
+    its job id, 'failed' or 'invalid' with the reason), in the order the
+    calls complete, then an 'end' event with the totals.
+    """
+    workers = max(1, _setting('BULK_PROVISION_WORKERS', 4))
+    rate = _setting('BULK_PROVISION_RATE', 5)
+    max_rows = _setting('BULK_PROVISION_MAX_ROWS', 5000)
+    keepalive = _setting('SSE_KEEPALIVE_SECONDS', 15)
+    interval = 1 / rate if rate else 0
+
+    loop = asyncio.get_running_loop()
+    next_slot = loop.time()
+    totals = {'submitted': 0, 'failed': 0, 'invalid': 0, 'truncated': False}
+    rows = iter(rows)
+    pending = set()
+    exhausted = False
+    read = 0
+    try:
+        yield sse.comment("connected")
+
+        while not exhausted or pending:
+            # 1. Top the pipeline up, one row at a time. Reads from the spooled
+            # upload are small and local, so they stay on the loop.
+            while not exhausted and len(pending) < workers:
+                row = next(rows, None)
+                if row is None:
+                    exhausted = True
+                    break
+                read += 1
+                if read > max_rows:
+                    totals['truncated'] = True
+                    exhausted = True
+                    break
+
+                if row.error:
+                    totals['invalid'] += 1
+                    yield _row_event(row, 'invalid', error=row.error)
+                    continue
+
+                # 2. Rate limit: every submission gets its own slot, `interval` apart
+                delay = next_slot - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_slot = max(next_slot, loop.time()) + interval
+                pending.add(asyncio.create_task(_submit(token, row)))
+
+            if not pending:
+                continue
+
+            # 3. Report whatever finished; a comment keeps the stream alive meanwhile
+            done, pending = await asyncio.wait(pending, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                yield sse.comment("keep-alive")
+            for task in done:
+                row, result = task.result()
+                if result["success"]:
+                    totals['submitted'] += 1
+                    yield _row_event(row, 'submitted', job_id=result["job_id"])
+                else:
+                    totals['failed'] += 1
+                    yield _row_event(row, 'failed', error=result["error"])
+
+        yield sse.event([json.dumps(totals)], event='end')
+    finally:
+        # Also runs when the browser goes away: calls not answered yet are dropped
+        # (FastAPI may still have received them)
+        for task in pending:
+            task.cancel()
+        if totals['submitted']:
+            # Once for the whole import instead of once per device
+            await sync_to_async(invalidate, thread_sensitive=False)('devices', 'stats', 'jobs', 'job_changes')
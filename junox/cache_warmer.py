@@ -0,0 +1,196 @@
+# junox/cache_warmer.py
+"""
+Keeps the shared, expensive datasets (dashboard stats, the inventory, the
+VLAN catalog) warm in the response cache, so users don't pay for a cold
+fetch after each TTL or deploy.
+
+A service account (JUNOX_SERVICE_USERNAME/PASSWORD) refetches every entry
+that would expire before the next run. That only helps users when the
+groups are in API_CACHE_SHARED_GROUPS: other entries are per user.
+
+- warm() is one run. `manage.py warm_cache` calls it once, for a deploy
+  script, or in a loop (--loop) as its own scheduler process.
+- With CACHE_WARM_IN_PROCESS the same loop runs in a daemon thread of each
+  web worker, started from JunoxConfig.ready().
+- Runs are CACHE_WARM_INTERVAL apart, give or take CACHE_WARM_JITTER, so
+  workers started together drift apart. They never overlap: a run is
+  skipped while one is in progress in this process, or when another
+  process sharing the cache has claimed the slot.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+import requests
+
+from .api_cache import cached_get
+from .api_client import api_post
+from .services import _device_page_from, _device_page_query
+from . import metrics, tokens
+
+API_URL = settings.API_URL
+
+CLAIM_KEY = 'junox:cache_warm:claim'
+
+# First page of the inventory as device_dashboard_view asks for it
+INVENTORY_PAGE_SIZE = 15
+
+logger = logging.getLogger(__name__)
+
+_running = threading.Lock()
+_stop = threading.Event()
+_service_token = {'access': None, 'refresh': None}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _interval():
+    return _setting('CACHE_WARM_INTERVAL', 20)
+
+
+def _jitter():
+    return _setting('CACHE_WARM_JITTER', 0.2)
+
+
+def configured():
+    return bool(_setting('JUNOX_SERVICE_USERNAME', None) and _setting('JUNOX_SERVICE_PASSWORD', None))
+
+
+def _targets():
+    # (group, url, params): the same requests the views make, so they land on the same cache keys
+    _, query = _device_page_query('', 0, INVENTORY_PAGE_SIZE, None, None)
+    first_page = {key: value for key, value in query.items() if value not in (None, '')}
+
+    targets = [
+        ('stats', f"{API_URL}/devices/inventory/stats", None),
+        ('devices', f"{API_URL}/devices", None),
+        ('vlan_catalog', f"{API_URL}/vlans/get_vlan_catalog_db", None),
+    ]
+    if first_page:
+        targets.insert(2, ('devices', f"{API_URL}/devices", first_page))
+    return targets
+
+
+def _login():
+    response = api_post(API_URL + "/token", data={
+        'username': _setting('JUNOX_SERVICE_USERNAME', None),
+        'password': _setting('JUNOX_SERVICE_PASSWORD', None),
+    })
+    if response.status_code != 200:
+        raise PermissionError(f"Service account login refused: {response.status_code}")
+    data = response.json()
+    _service_token.update(access=data.get('access_token'), refresh=data.get('refresh_token'))
+
+
+def _token():
+    """The service account's access token, refreshed (or logged in again) when it's about to expire."""
+    access = _service_token['access']
+    expires = tokens.token_expiry(access) if access else None
+    window = _setting('TOKEN_REFRESH_WINDOW_SECONDS', 5 * 60)
+
+    if access and (expires is None or expires - time.time() > window):
+        return access
+
+    if access and _service_token['refresh']:
+        new_token = tokens.refresh_access_token(_service_token['refresh'])
+        if new_token:
+            _service_token['access'] = new_token
+            return new_token
+    _login()
+    return _service_token['access']
+
+
+def _warm_target(token, group, url, params, fresh_for):
+    try:
+        response = cached_get(group, url, token=token, params=params, fresh_for=fresh_for)
+    except requests.exceptions.RequestException as e:
+        logger.warning("Cache warm: %s unreachable: %s", group, e)
+        return 'unreachable'
+    if response.stale:
+        return 'stale'
+    if not response.ok:
+        logger.warning("Cache warm: %s answered %s", group, response.status_code)
+        return 'error'
+    if group == 'devices' and params:
+        # Lets this process find out whether FastAPI pages server-side, like the views do
+        _device_page_from(response, '', 0, INVENTORY_PAGE_SIZE, None)
+    return 'ok'
+
+
+def warm(force=False):
+    """
+    One warming run. Returns [(group, result), ...], or None if the run was
+    skipped because another one holds the slot (force=True ignores other
+    processes, for pre-warming at deploy time).
+    """
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        interval = _interval()
+        # The slot is held until the earliest next run anywhere, so workers sharing
+        # the cache take turns instead of all warming the same entries
+        if not cache.add(CLAIM_KEY, os.getpid(), timeout=max(1, int(interval * (1 - _jitter())))) and not force:
+            return None
+
+        try:
+            token = _token()
+        except (requests.exceptions.RequestException, PermissionError) as e:
+            logger.warning("Cache warm: no service token: %s", e)
+            metrics.count_cache_warm('login', 'error')
+            return [('login', 'error')]
+
+        # Anything that would expire before the latest next run gets refetched now
+        fresh_for = interval * (1 + _jitter()) + 5
+        results = []
+        for group, url, params in _targets():
+            result = _warm_target(token, group, url, params, fresh_for)
+            metrics.count_cache_warm(group, result)
+            results.append((group, result))
+        return results
+    finally:
+        _running.release()
+
+
+def next_delay():
+    """Seconds until the next run: the interval, jittered."""
+    return _interval() * (1 + random.uniform(-_jitter(), _jitter()))
+
+
+def run_forever(stop=_stop):
+    # Random first delay, so workers booted together don't all go at once
+    delay = random.uniform(0, _interval() * _jitter())
+    while not stop.wait(delay):
+        try:
+            warm()
+        except Exception:
+            # Whatever went wrong, the next run tries again
+            logger.exception("Cache warm failed")
+        delay = next_delay()
+
+
+def _is_server_process():
+    # ready() runs for every manage.py command too; only warm from servers
+    if not os.path.basename(sys.argv[0]).startswith('manage'):
+        return True  # gunicorn, uvicorn, daphne...
+    if len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+        return False
+    # The autoreloader's parent process only watches files
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+
+
+def start_in_process():
+    """Starts run_forever() in a daemon thread if CACHE_WARM_IN_PROCESS is on and this is a web server."""
+    if not _setting('CACHE_WARM_IN_PROCESS', False) or not _is_server_process():
+        return
+    if not configured():
+        logger.warning("CACHE_WARM_IN_PROCESS is on but JUNOX_SERVICE_USERNAME/PASSWORD are not set: not warming")
+        return
+    threading.Thread(target=run_forever, name='junox-cache-warm', daemon=True).start()
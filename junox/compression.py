@@ -0,0 +1,125 @@
+# junox/compression.py
+"""
+Smaller HTML on the wire, opt-in (JUNOX_HTML_MINIFY, JUNOX_COMPRESS).
+
+The table pages are mostly template indentation and repeated Tailwind
+classes, which minify and compress very well:
+
+- minify_html() drops the templates' indentation and blank lines: a run of
+  whitespace containing a line break becomes a single line break, which
+  renders the same. <pre>, <textarea>, <script> and <style> are left alone.
+- Responses of at least COMPRESS_MIN_BYTES are brotli-compressed when the
+  browser takes it and the optional brotli package is installed, gzipped
+  otherwise, with Django's BREACH padding. Brotli has no header to pad,
+  so pages that rendered a CSRF token are always gzipped.
+- Event streams are never touched: a compressor holds output back until
+  it has enough input, which would stall live events.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/javascript', 'text/xml',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+
+# Same padding as Django's GZipMiddleware
+MAX_RANDOM_BYTES = 100
+
+_PROTECTED = re.compile(r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.S | re.I)
+_LINE_BREAK_RUN = re.compile(r'\s*\n\s*')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def minify_html(html):
+    """`html` without its indentation and blank lines (see the module docstring)."""
+    parts = []
+    position = 0
+    for block in _PROTECTED.finditer(html):
+        parts.append(_LINE_BREAK_RUN.sub('\n', html[position:block.start()]))
+        parts.append(block.group(0))
+        position = block.end()
+    parts.append(_LINE_BREAK_RUN.sub('\n', html[position:]))
+    return ''.join(parts)
+
+
+def accepted_encoding(request):
+    """'br', 'gzip' or None: the best encoding both sides support."""
+    accept = request.headers.get('Accept-Encoding', '')
+    offered = {part.split(';', 1)[0].strip().lower() for part in accept.split(',')}
+    # get_token() sets this: the page carries a CSRF token, which only gzip pads
+    csrf_rendered = request.META.get('CSRF_COOKIE_NEEDS_UPDATE', False)
+    if brotli is not None and 'br' in offered and not csrf_rendered:
+        return 'br'
+    if 'gzip' in offered:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=_setting('COMPRESS_BROTLI_QUALITY', 5))
+    return compress_string(content, max_random_bytes=MAX_RANDOM_BYTES)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Minifies and/or compresses responses (settings JUNOX_HTML_MINIFY and
+    JUNOX_COMPRESS). Not loaded at all when both are off.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.minify = _setting('JUNOX_HTML_MINIFY', False)
+        self.compress = _setting('JUNOX_COMPRESS', False)
+        if not (self.minify or self.compress):
+            raise MiddlewareNotUsed
+
+        self.min_bytes = _setting('COMPRESS_MIN_BYTES', 1024)
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if response.streaming or response.has_header('Content-Encoding'):
+            # Event streams included: they must reach the browser frame by frame
+            return response
+
+        if self.minify and content_type == 'text/html':
+            charset = response.charset
+            response.content = minify_html(response.content.decode(charset)).encode(charset)
+            response['Content-Length'] = str(len(response.content))
+
+        if not self.compress or content_type not in COMPRESSIBLE_TYPES:
+            return response
+        if len(response.content) < self.min_bytes:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request)
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+
+        # Same bytes, different representation: a strong ETag has to become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,218 @@
+# junox/concurrency.py
+"""
+Helpers for running several blocking backend calls at once.
+
+Views that need more than one service call use gather() so page latency is
+roughly the slowest call instead of the sum of all of them.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'JUNOX_FANOUT_WORKERS', 16),
+                    thread_name_prefix='junox-fanout',
+                )
+    return _executor
+
+
+def _reset_after_fork():
+    # Executor threads don't survive a fork; children build their own pool.
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _call(name, func, args):
+    try:
+        return func(*args)
+    except Exception:
+        logger.exception("Fan-out call %r failed", name)
+        raise
+
+
+def gather(calls, timeout=None, default=None):
+    """
+    Runs service calls concurrently and returns their results by name.
+
+        results = gather({
+            'interfaces': (get_device_interfaces, token, device_id),
+            'vlans': (service_get_device_vlans, token, device_id),
+        })
+
+    A call that raises or is still running when `timeout` (seconds, defaults
+    to JUNOX_FANOUT_TIMEOUT) expires gets `default` as its result, so the
+    view can render whatever did come back.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'JUNOX_FANOUT_TIMEOUT', 15)
+
+    if len(calls) == 1:
+        # Nothing to overlap with, skip the thread hop.
+        (name, (func, *args)), = calls.items()
+        try:
+            return {name: _call(name, func, args)}
+        except Exception:
+            return {name: default}
+
+    executor = _get_executor()
+    futures = {}
+    for name, (func, *args) in calls.items():
+        # Copy the context so request-scoped contextvars follow the call.
+        ctx = contextvars.copy_context()
+        futures[name] = executor.submit(ctx.run, _call, name, func, args)
+
+    done, _ = wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        if future not in done:
+            logger.warning("Fan-out call %r timed out after %ss", name, timeout)
+            future.cancel()
+            results[name] = default
+        elif future.exception() is not None:
+            results[name] = default
+        else:
+            results[name] = future.result()
+    return results
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def map_bounded(func, items, limit=None):
+    """
+    Calls func(item) for every item on the fan-out pool, with at most `limit`
+    calls (default API_BULK_CONCURRENCY) in flight, and returns the results
+    in item order. A call that raises gets its exception as its result, so
+    one failure doesn't hide the others.
+    """
+    if limit is None:
+        limit = getattr(settings, 'API_BULK_CONCURRENCY', 8)
+    items = list(items)
+    results = [None] * len(items)
+
+    executor = _get_executor()
+    pending = {}
+    position = 0
+    while position < len(items) or pending:
+        # Top up to the limit, then wait for any call to finish
+        while position < len(items) and len(pending) < limit:
+            ctx = contextvars.copy_context()
+            pending[executor.submit(ctx.run, func, items[position])] = position
+            position += 1
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logger.exception("Bulk call %d failed", index)
+                results[index] = e
+    return results
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and get the same result (or exception) instead
+    of repeating the work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, func, *args, timeout=None):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight call {key!r}")
+        else:
+            try:
+                flight.result = func(*args)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+
+async def agather(calls, timeout=None, default=None):
+    """
+    Async version of gather(): `calls` maps names to (coroutine function,
+    *args), all awaited concurrently on the running event loop.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'JUNOX_FANOUT_TIMEOUT', 15)
+
+    names = list(calls)
+    tasks = [asyncio.ensure_future(func(*args)) for func, *args in calls.values()]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+
+    results = {}
+    for name, task in zip(names, tasks):
+        if task in pending:
+            logger.warning("Fan-out call %r timed out after %ss", name, timeout)
+            task.cancel()
+            results[name] = default
+        elif task.exception() is not None:
+            logger.error("Fan-out call %r failed", name, exc_info=task.exception())
+            results[name] = default
+        else:
+            results[name] = task.result()
+    return results
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines; calls are only shared within one event loop."""
+
+    def __init__(self):
+        self._flights = weakref.WeakKeyDictionary()
+
+    async def do(self, key, func, *args):
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        future = flights.get(key)
+        if future is None:
+            future = flights[key] = asyncio.ensure_future(func(*args))
+            future.add_done_callback(lambda _, key=key: flights.pop(key, None))
+        # shield: one impatient caller being cancelled mustn't cancel everyone's fetch
+        return await asyncio.shield(future)
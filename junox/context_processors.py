@@ -1,35 +1,122 @@
 # junox/context_processors.py
-import requests
+import threading
+import time
+
 from django.conf import settings
+from django.core.cache import caches
+
+from .breaker import open_groups
+from .services import service_get_api_health
+from .sse import streams_supported
+
+HEALTH_CACHE_KEY = 'junox:api_health'
+
+# Process-local copy of the last health check: {'info': {...}, 'checked_at': epoch seconds}
+_health = {'info': None, 'checked_at': 0.0}
+# Held by the one refresh in flight
+_refreshing = threading.Lock()
+
+# Shown until a process's first check has finished, instead of a false "Offline"
+CHECKING_INFO = {'version': '…', 'title': 'JunoX API', 'status': 'checking'}
+
+
+def _offline_info():
+    return dict(getattr(
+        settings,
+        'API_HEALTH_OFFLINE_INFO',
+        {'version': 'Offline', 'title': 'JunoX API', 'status': 'offline'},
+    ))
+
+
+def _shared_cache():
+    alias = getattr(settings, 'API_HEALTH_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _refresh_health():
+    try:
+        data = service_get_api_health()
+        if data is not None:
+            info = {
+                'version': f"v{data.get('version')}",
+                'title': 'JunoX API',
+                'status': data.get('status'),
+            }
+        else:
+            info = _offline_info()
+
+        entry = {'info': info, 'checked_at': time.time()}
+        _health.update(entry)
+
+        shared = _shared_cache()
+        if shared is not None:
+            shared.set(HEALTH_CACHE_KEY, entry, timeout=None)
+    finally:
+        _refreshing.release()
+
+
+def _schedule_refresh():
+    # Only one refresh in flight per process; everyone else keeps serving
+    # the value we already have.
+    if not _refreshing.acquire(blocking=False):
+        return
+    try:
+        threading.Thread(target=_refresh_health, name='junox-health', daemon=True).start()
+    except RuntimeError:
+        _refreshing.release()
+
+
+def fragment_cache(request):
+    # Lifetime of the {% cache %} fragments; their keys carry the data version,
+    # so this only bounds how long an unused fragment sits in the cache
+    return {'fragment_ttl': getattr(settings, 'TEMPLATE_FRAGMENT_TTL', 600)}
+
+
+def started_jobs(request):
+    # Jobs just started by assign_vlan/add_device: shown once, with live status,
+    # on the page the user lands on (partials/job_watch.html)
+    if 'started_jobs' not in getattr(request, 'session', {}):
+        return {}
+    return {'started_jobs': request.session.pop('started_jobs')}
+
+
+def job_watch(request):
+    # How the pages follow running jobs (partials/job_status.html): an event stream
+    # under ASGI, polling under WSGI where a stream would hold a worker thread
+    return {
+        'job_streams': streams_supported(request),
+        'job_poll_ms': int(getattr(settings, 'JOB_POLL_SECONDS', 5) * 1000),
+        'job_watch_max_ms': int(getattr(settings, 'JOB_STREAM_MAX_SECONDS', 900) * 1000),
+    }
+
+
+def backend_breakers(request):
+    # Endpoint groups failing fast right now (breaker.py): base.html shows a
+    # degraded-mode banner, pages come from the last cached data meanwhile
+    return {'degraded_groups': open_groups()}
 
 
 def api_version_info(request):
     """
-    Fetches the version from FastAPI's OpenAPI metadata.
-    Returns a dictionary available in all templates as {{ api_info }}.
+    Returns the backend version/status as {{ api_info }} for all templates.
+
+    Served stale-while-revalidate: rendering never waits on the network.
+    Once the cached value is older than API_HEALTH_TTL a background thread
+    re-checks /health, and until the first check completes a neutral
+    "checking" badge is shown.
     """
+    ttl = getattr(settings, 'API_HEALTH_TTL', 30)
 
-    url = f"{settings.API_ROOT}/health"
-    
-    try:
-        # Short timeout (0.5s) so page loads aren't delayed if API is down
-        response = requests.get(url, timeout=0.5)
-        if response.status_code == 200:
-            data = response.json()
-            version = data.get('version')
-            return {
-                'api_info': {
-                    'version': f"v{version}",
-                    'title': 'JunoX API',
-                    'status': data.get('status')
-                }
+    if time.time() - _health['checked_at'] >= ttl:
+        # Another worker may already have a fresher answer
+        shared = _shared_cache()
+        entry = shared.get(HEALTH_CACHE_KEY) if shared is not None else None
+        if entry and entry['checked_at'] > _health['checked_at']:
+            _health.update(entry)
 
-            }
-    except Exception:
-        pass
+        if time.time() - _health['checked_at'] >= ttl:
+            _schedule_refresh()
 
     return {
- 
-        'api_info': {'version': 'Offline', 'title': 'JunoX API', 'status': 'offline'}
-
-    }
\ No newline at end of file
+        'api_info': _health['info'] or CHECKING_INFO
+    }
@@ -0,0 +1,165 @@
+# junox/job_stream.py
+"""
+Live job status for the pages that start or list jobs (jobs_list, and the
+job panel shown after assign_vlan / add_device).
+
+A watcher follows a set of job ids and/or every job that changed after a
+`since` cursor (epoch seconds of created_at/ended_at), asking FastAPI for
+just those jobs (services.service_get_job_changes) through the response
+cache's short-lived 'job_changes' group.
+
+- Under ASGI it's an event stream: every JOB_STREAM_POLL_SECONDS it asks
+  again for the jobs still running and the ones changed after its cursor,
+  and sends only those whose state differs from what it last sent. Each
+  event's SSE id is the cursor, so a reconnecting browser resumes from it
+  (Last-Event-ID) instead of starting over.
+- Under WSGI an open stream would hold a worker thread, so the pages poll
+  job_snapshot() (views.jobs_status) every JOB_POLL_SECONDS instead.
+"""
+import asyncio
+import json
+
+from django.conf import settings
+
+from . import async_services, sse
+from .search import job_timestamp
+
+# Anything else counts as finished
+ACTIVE_JOB_STATUSES = ('queued', 'pending', 'scheduled', 'deferred', 'started', 'running')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def job_state(job):
+    """
+    What the jobs table shows for `job`: {'state': ok|running|failed, 'label': ...}.
+    Same rules as the status badge in jobs_list.html.
+    """
+    status = job.get('status')
+    result = job.get('result')
+    failed = status == 'completed' and isinstance(result, dict) and result.get('status') == 'Error'
+
+    if status == 'completed' and not failed:
+        state = 'ok'
+    elif status == 'running':
+        state = 'running'
+    else:
+        state = 'failed'
+    return {'state': state, 'label': 'Failed' if failed else str(status or '').title()}
+
+
+def job_event(job):
+    """The JSON payload of a 'job' event."""
+    return dict(
+        job_state(job),
+        id=job.get('id'),
+        status=job.get('status'),
+        task_type=job.get('task_type'),
+        target=job.get('target'),
+        created_at=job.get('created_at'),
+        ended_at=job.get('ended_at'),
+        # Same text the table puts in its details modal
+        result=str(job.get('result')),
+        finished=job.get('status') not in ACTIVE_JOB_STATUSES,
+    )
+
+
+class JobChanges:
+    """Remembers what was sent, and picks the watched jobs that changed since."""
+
+    def __init__(self, ids=(), since=None):
+        self.ids = {str(job_id) for job_id in ids}
+        self.cursor = since
+        self._sent = {}
+
+    def _watched(self, job):
+        if str(job.get('id')) in self.ids:
+            return True
+        if self.cursor is None:
+            return False
+        stamp = job_timestamp(job)
+        return stamp is not None and stamp > self.cursor
+
+    def update(self, jobs):
+        """Returns the payloads of the watched jobs that changed, and advances the cursor."""
+        changed = []
+        newest = self.cursor
+        for job in jobs:
+            if not self._watched(job):
+                continue
+            payload = job_event(job)
+            key = str(payload['id'])
+            if self._sent.get(key) != payload:
+                self._sent[key] = payload
+                changed.append(payload)
+            stamp = job_timestamp(job)
+            if stamp is not None and (newest is None or stamp > newest):
+                newest = stamp
+
+        if self.cursor is not None:
+            self.cursor = newest
+        return changed
+
+    def pending_ids(self):
+        """The watched ids not seen finished yet: the only ones worth asking about again."""
+        return sorted(job_id for job_id in self.ids if not self._sent.get(job_id, {}).get('finished'))
+
+    def all_finished(self):
+        """True once every watched id has been seen finished (id-only streams end then)."""
+        return self.cursor is None and all(
+            self._sent.get(str(job_id), {}).get('finished') for job_id in self.ids
+        )
+
+
+def job_query(request):
+    """
+    (ids, since) of a job watcher request: ?ids=a,b (at most 50) and/or
+    ?since=<epoch seconds>, or Last-Event-ID when a stream reconnects.
+    """
+    ids = [job_id for job_id in request.GET.get('ids', '').split(',') if job_id][:50]
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        since = float(since) if since else None
+    except ValueError:
+        since = None
+    return ids, since
+
+
+def job_snapshot(jobs, ids, since):
+    """One poll's answer: the watched jobs' current state and the cursor to send next time."""
+    changes = JobChanges(ids, since)
+    return {'jobs': changes.update(jobs), 'cursor': changes.cursor}
+
+
+async def stream_job_updates(token, ids=(), since=None):
+    """Async iterator of SSE frames: a 'job' event per change, 'end' when there's nothing left to watch."""
+    changes = JobChanges(ids, since)
+    poll = _setting('JOB_STREAM_POLL_SECONDS', 3)
+    keepalive = _setting('SSE_KEEPALIVE_SECONDS', 15)
+
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + _setting('JOB_STREAM_MAX_SECONDS', 900)
+    quiet_since = loop.time()
+
+    yield sse.comment("connected")
+    while loop.time() < give_up_at:
+        result = await async_services.service_get_job_changes(token, changes.pending_ids(), changes.cursor)
+        if result['success']:
+            updates = changes.update(result['jobs'])
+            for n, payload in enumerate(updates, 1):
+                # The cursor covers the whole batch, so only its last event carries it
+                cursor = changes.cursor if n == len(updates) else None
+                yield sse.event([json.dumps(payload)], event='job', id=cursor)
+                quiet_since = loop.time()
+
+            if changes.ids and changes.all_finished():
+                break
+
+        if loop.time() - quiet_since >= keepalive:
+            yield sse.comment("keep-alive")
+            quiet_since = loop.time()
+        await asyncio.sleep(poll)
+
+    yield sse.event(['closed'], event='end')
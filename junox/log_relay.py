@@ -0,0 +1,142 @@
+# junox/log_relay.py
+"""
+Relays the live log of a provisioning session (add_device debug mode) from
+FastAPI's log WebSocket to the browser as Server-Sent Events, so the page
+only ever talks to the frontend's own origin.
+
+Each stream is one upstream reader task feeding a bounded queue. When the
+browser reads slower than the backend writes, the queue fills up and the
+reader stops reading the WebSocket, which slows the backend down instead of
+buffering without limit here. Lines arriving close together go out as one
+SSE frame. All of it runs on the event loop, so an open stream costs a task
+and two sockets, not a thread. Under WSGI each stream does hold a worker
+thread, plus an event loop of its own, for up to LOG_RELAY_MAX_SECONDS.
+
+Needs the optional `websockets` package.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+
+from . import sse
+
+try:
+    import websockets
+    try:
+        from websockets.asyncio.client import connect as _ws_connect
+        _HEADERS_ARG = 'additional_headers'
+    except ImportError:  # websockets < 13
+        from websockets import connect as _ws_connect
+        _HEADERS_ARG = 'extra_headers'
+except ImportError:  # pragma: no cover - depends on the deployment
+    websockets = None
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class _Closed:
+    """Queue marker: the upstream socket is done, with an error message if it failed."""
+
+    def __init__(self, error=None):
+        self.error = error
+
+
+async def _read_upstream(session_id, token, queue):
+    url = f"{_setting('API_WS_ROOT', 'ws://127.0.0.1:8000')}/ws/logs/{session_id}"
+    options = {
+        _HEADERS_ARG: {'Authorization': f'Bearer {token}'},
+        'open_timeout': _setting('API_CONNECT_TIMEOUT', 2),
+        # Keep the library's own buffer small so our queue is what applies backpressure
+        'max_queue': 16,
+    }
+
+    closed = _Closed()
+    try:
+        async with _ws_connect(url, **options) as socket:
+            async for message in socket:
+                if isinstance(message, bytes):
+                    message = message.decode('utf-8', 'replace')
+                # Waits while the queue is full, i.e. while the browser is behind
+                await queue.put(message)
+    except (websockets.exceptions.WebSocketException, OSError, asyncio.TimeoutError) as e:
+        logger.warning("Log relay error for %s: %s", session_id, e)
+        closed = _Closed(f"Log stream unavailable: {e}")
+    await queue.put(closed)
+
+
+async def _next_batch(queue, first, max_lines, window):
+    """
+    Collects `first` plus the lines that arrive within `window` seconds
+    (at most `max_lines`). Returns (lines, _Closed marker or None).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + window
+    lines = []
+    item = first
+
+    while not isinstance(item, _Closed):
+        lines.append(item)
+        if len(lines) >= max_lines:
+            return lines, None
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return lines, None
+            try:
+                item = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return lines, None
+    return lines, item
+
+
+async def stream_session_logs(session_id, token):
+    """
+    Async iterator of SSE frames with the log lines of `session_id`.
+    Ends with an 'end' event when the backend closes the log (or after
+    LOG_RELAY_MAX_SECONDS); failures arrive as a 'relay-error' event first.
+    """
+    if websockets is None:
+        yield sse.event(["Live logs need the 'websockets' package on the frontend server."], event='relay-error')
+        yield sse.event(['closed'], event='end')
+        return
+
+    max_lines = _setting('LOG_RELAY_BATCH_LINES', 50)
+    window = _setting('LOG_RELAY_BATCH_WINDOW', 0.05)
+    keepalive = _setting('SSE_KEEPALIVE_SECONDS', 15)
+
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + _setting('LOG_RELAY_MAX_SECONDS', 900)
+
+    queue = asyncio.Queue(maxsize=_setting('LOG_RELAY_QUEUE_LINES', 200))
+    reader = asyncio.create_task(_read_upstream(session_id, token, queue))
+    try:
+        # Sent right away so proxies and the browser see the stream open
+        yield sse.comment("connected")
+
+        closed = None
+        while closed is None and loop.time() < give_up_at:
+            try:
+                first = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                # Idle: a comment keeps proxies from timing the connection out
+                yield sse.comment("keep-alive")
+                continue
+
+            lines, closed = await _next_batch(queue, first, max_lines, window)
+            if lines:
+                yield sse.event(lines)
+
+        if closed is not None and closed.error:
+            yield sse.event([closed.error], event='relay-error')
+        yield sse.event(['closed'], event='end')
+    finally:
+        # Also runs when the browser goes away: stop reading the backend
+        reader.cancel()
+
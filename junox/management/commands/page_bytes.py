@@ -0,0 +1,67 @@
+# junox/management/commands/page_bytes.py
+"""
+Bytes on the wire per page: as rendered, minified, gzipped and brotli'd.
+
+    python manage.py page_bytes --username admin --password ... [path ...]
+
+Logs in against the configured FastAPI backend and renders each page
+in-process (no server needed), with the compression middleware off so the
+raw page is what gets measured.
+"""
+import getpass
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from junox import compression
+
+DEFAULT_PAGES = ('junox:dashboard', 'junox:device_dashboard', 'junox:jobs_list', 'junox:vlan_catalog')
+
+
+def _kb(size):
+    return f'{size / 1024:.1f} KB' if size is not None else '-'
+
+
+class Command(BaseCommand):
+    help = "Measures each page's size as rendered, minified, gzipped and brotli-compressed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="Pages to measure (default: dashboard, inventory, jobs, VLAN pool)")
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', help="Asked for when left out")
+
+    def handle(self, *args, **options):
+        password = options['password'] or getpass.getpass("Backend password: ")
+        paths = options['paths'] or [reverse(name) for name in DEFAULT_PAGES]
+
+        with override_settings(JUNOX_HTML_MINIFY=False, JUNOX_COMPRESS=False):
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost')
+            response = client.post(reverse('junox:login_junox'),
+                                   {'username': options['username'], 'password': password})
+            if response.status_code != 302 or 'auth_token' not in client.session:
+                raise CommandError("Login failed: check the credentials and that the backend is up")
+
+            self.stdout.write(f"{'page':<40} {'raw':>10} {'minified':>10} {'gzip':>10} {'br':>10} {'saved':>7}")
+            for path in paths:
+                self._measure(client, path)
+
+        if compression.brotli is None:
+            self.stdout.write("(no brotli package: br column left empty)")
+
+    def _measure(self, client, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            self.stdout.write(f"{path:<40} HTTP {response.status_code}")
+            return
+
+        raw = response.content
+        minified = compression.minify_html(raw.decode(response.charset)).encode(response.charset)
+        gzipped = len(compression.compress(minified, 'gzip'))
+        brotlied = len(compression.compress(minified, 'br')) if compression.brotli is not None else None
+
+        smallest = min(size for size in (gzipped, brotlied) if size is not None)
+        saved = 100 * (1 - smallest / len(raw))
+        self.stdout.write(f"{path:<40} {_kb(len(raw)):>10} {_kb(len(minified)):>10} "
+                          f"{_kb(gzipped):>10} {_kb(brotlied):>10} {saved:>6.0f}%")
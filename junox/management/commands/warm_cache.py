@@ -0,0 +1,50 @@
+# junox/management/commands/warm_cache.py
+"""
+Fills the shared response cache with the service account (cache_warmer.py).
+
+    python manage.py warm_cache           # once, e.g. right after a deploy
+    python manage.py warm_cache --loop    # keeps it warm, as its own process
+
+Only useful with a cache the web workers share (Redis, Memcached, the
+database): a local-memory cache is private to this process.
+"""
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from junox import cache_warmer
+
+
+class Command(BaseCommand):
+    help = "Pre-warms the cached dashboard stats, inventory and VLAN catalog, once or on a schedule."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep warming every CACHE_WARM_INTERVAL seconds (jittered) until stopped")
+
+    def handle(self, *args, **options):
+        if not cache_warmer.configured():
+            raise CommandError("Set JUNOX_SERVICE_USERNAME and JUNOX_SERVICE_PASSWORD first")
+
+        if not getattr(settings, 'API_CACHE_SHARED_GROUPS', None):
+            self.stderr.write("Warning: API_CACHE_SHARED_GROUPS is empty, only the service account's own entries get warmed")
+
+        backend = settings.CACHES['default']['BACKEND']
+        if backend.endswith('LocMemCache') or backend.endswith('DummyCache'):
+            self.stderr.write(f"Warning: {backend} isn't shared with the web workers, they won't see this")
+
+        if options['loop']:
+            self.stdout.write(f"Warming every {getattr(settings, 'CACHE_WARM_INTERVAL', 20):g}s, Ctrl+C to stop")
+            try:
+                cache_warmer.run_forever(threading.Event())
+            except KeyboardInterrupt:
+                pass
+            return
+
+        # Deploy-time pre-warm: runs even if a worker warmed a moment ago
+        results = cache_warmer.warm(force=True)
+        for group, result in results:
+            self.stdout.write(f"{group:<14} {result}")
+        if any(result != 'ok' for _, result in results):
+            raise CommandError("Some datasets could not be warmed")
@@ -0,0 +1,302 @@
+# junox/metrics.py
+"""
+Where the time goes: per-request timings and process-wide counters.
+
+Each request gets a RequestTimings (in a contextvar, so fan-out threads
+and async tasks started by the request add to the same one) holding its
+template render time, its backend calls by endpoint and its cache
+lookups. MetricsMiddleware turns it into a Server-Timing header, which
+the browser's devtools show next to the request, and into the
+process-wide histograms and counters served at /junox/metrics/ in
+Prometheus' text format.
+
+Every worker process keeps its own numbers; scrape each worker (or sum
+them) like with any in-process registry.
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+# Seconds; the same buckets for every histogram
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+
+# name -> (type, help)
+METRICS = {
+    'junox_request_duration_seconds': ('histogram', 'Time until the view returned its response, by view.'),
+    'junox_template_render_seconds': ('histogram', 'Template rendering time, by template.'),
+    'junox_backend_request_duration_seconds': ('histogram', 'FastAPI calls, by endpoint and status.'),
+    'junox_cache_requests_total': ('counter', 'Response cache lookups, by endpoint group and result.'),
+    'junox_cache_warm_total': ('counter', 'Cache warmer fetches, by endpoint group and result.'),
+    'junox_token_refresh_total': ('counter', 'Access token refreshes, by result.'),
+    'junox_breaker_state': ('gauge', 'Circuit breaker per backend endpoint group: 0 closed, 1 half-open, 2 open.'),
+    'junox_breaker_rejections_total': ('counter', 'Backend calls failed fast by an open circuit breaker.'),
+}
+
+BREAKER_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+# Path parts that vary per call, folded so each endpoint is one series
+_ENDPOINT_RULES = (
+    (re.compile(r'/devices/provision/[^/]+'), '/devices/provision/{hostname}'),
+    (re.compile(r'/\d+(?=/|$)'), '/{id}'),
+)
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._gauges = {}                    # (name, labels) -> value
+        self._histograms = {}                # (name, labels) -> [bucket counts..., sum, count]
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[(name, labels)] += amount
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._gauges[(name, labels)] = value
+
+    def observe(self, name, labels, seconds):
+        with self._lock:
+            series = self._histograms.get((name, labels))
+            if series is None:
+                series = self._histograms[(name, labels)] = [0] * len(BUCKETS) + [0.0, 0]
+            # Cumulative, like Prometheus wants them: an observation counts in every bucket it fits
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {key: list(series) for key, series in self._histograms.items()}
+            return dict(self._counters), dict(self._gauges), histograms
+
+
+_registry = _Registry()
+
+
+class RequestTimings:
+    """
+    What one request spent its time on (see MetricsMiddleware).
+    Fan-out threads of the same request add to it concurrently, hence the lock.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.render = 0.0
+        self.backend = defaultdict(lambda: [0, 0.0])  # endpoint -> [calls, seconds]
+        self.cache = defaultdict(int)                  # result -> lookups
+        self._lock = threading.Lock()
+
+    def add_render(self, seconds):
+        with self._lock:
+            self.render += seconds
+
+    def add_backend(self, endpoint, seconds):
+        with self._lock:
+            entry = self.backend[endpoint]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_cache(self, result):
+        with self._lock:
+            self.cache[result] += 1
+
+    def server_timing(self, total):
+        with self._lock:
+            render = self.render
+            backend = sorted(((endpoint, tuple(entry)) for endpoint, entry in self.backend.items()),
+                             key=lambda item: -item[1][1])
+            cache = sorted(self.cache.items())
+
+        parts = [f'view;dur={total * 1000:.1f}']
+        if render:
+            parts.append(f'render;dur={render * 1000:.1f}')
+        for endpoint, (calls, seconds) in backend:
+            parts.append(f'api;dur={seconds * 1000:.1f};desc="{endpoint} x{calls}"')
+        if cache:
+            counts = ' '.join(f'{result}={count}' for result, count in cache)
+            parts.append(f'cache;desc="{counts}"')
+        return ', '.join(parts)
+
+
+_timings = contextvars.ContextVar('junox_request_timings', default=None)
+
+
+def endpoint_path(url):
+    """'/interfaces/{id}/interfaces_db' for a backend URL."""
+    path = url.split('?', 1)[0]
+    for root in (settings.API_URL, settings.API_ROOT):
+        if path.startswith(root):
+            path = path[len(root):]
+            break
+    for pattern, replacement in _ENDPOINT_RULES:
+        path = pattern.sub(replacement, path)
+    return path or '/'
+
+
+def endpoint_label(method, url):
+    return f'{method} {endpoint_path(url)}'
+
+
+def observe_backend(method, url, seconds, status):
+    endpoint = endpoint_label(method, url)
+    _registry.observe('junox_backend_request_duration_seconds', (('endpoint', endpoint), ('status', str(status))), seconds)
+
+    timings = _timings.get()
+    if timings is not None:
+        timings.add_backend(endpoint, seconds)
+
+
+def count_cache(group, result):
+    _registry.inc('junox_cache_requests_total', (('group', group), ('result', result)))
+
+    timings = _timings.get()
+    if timings is not None:
+        timings.add_cache(result)
+
+
+def count_cache_warm(group, result):
+    _registry.inc('junox_cache_warm_total', (('group', group), ('result', result)))
+
+
+def count_token_refresh(result):
+    _registry.inc('junox_token_refresh_total', (('result', result),))
+
+
+def set_breaker_state(group, state):
+    _registry.set('junox_breaker_state', (('group', group),), BREAKER_STATE_VALUES[state])
+
+
+def count_breaker_rejection(group):
+    _registry.inc('junox_breaker_rejections_total', (('group', group),))
+
+
+class _TimedTemplate:
+    """A template of the backend below, timing each render."""
+
+    def __init__(self, template):
+        self.template = template
+        self.name = template.origin.template_name or 'from_string'
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            seconds = time.perf_counter() - started
+            _registry.observe('junox_template_render_seconds', (('template', self.name),), seconds)
+            timings = _timings.get()
+            if timings is not None:
+                timings.add_render(seconds)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template engine, with render times recorded (settings.TEMPLATES)."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class MetricsMiddleware:
+    """
+    Records each request's view time, adds the Server-Timing header.
+    Goes first in MIDDLEWARE so the time includes the other middleware
+    (session loading, token refresh).
+
+    For streaming responses that's the time until the stream started.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = RequestTimings()
+        reset = _timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(reset)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        reset = _timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(reset)
+        return self._finish(request, response, timings)
+
+    def _finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        labels = (('view', view), ('method', request.method), ('status', str(response.status_code)))
+        _registry.observe('junox_request_duration_seconds', labels, total)
+
+        if self.server_timing:
+            response['Server-Timing'] = timings.server_timing(total)
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = [f'{key}="{_escape(value)}"' for key, value in tuple(labels) + tuple(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render_prometheus():
+    """Every metric of this process, in Prometheus' text exposition format."""
+    counters, gauges, histograms = _registry.snapshot()
+    lines = []
+
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+        if kind in ('counter', 'gauge'):
+            values = counters if kind == 'counter' else gauges
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value:g}')
+            continue
+
+        for (metric, labels), series in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS, series):
+                lines.append(f'{name}_bucket{_labels(labels, [("le", f"{bound:g}")])} {count}')
+            lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{name}_sum{_labels(labels)} {series[-2]:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {series[-1]}')
+
+    return '\n'.join(lines) + '\n'
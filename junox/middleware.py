@@ -1,54 +1,93 @@
 # junox/middleware.py
-import jwt
-import datetime
-import requests
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
 
+from .tokens import refresh_access_token, store_auth_token, token_expiry
+
 API_URL = settings.API_URL
 
+logger = logging.getLogger(__name__)
+
 
 REFRESH_TOKEN_EXPIRE_IN_LESS_THAN = 5 #this is in minutes
 
 class TokenAutoRefreshMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        self.refresh_window = getattr(settings, 'TOKEN_REFRESH_WINDOW_SECONDS', REFRESH_TOKEN_EXPIRE_IN_LESS_THAN * 60)
+
+        # Paths that never need a fresh token (static files, health checks, the login page...)
+        exempt = getattr(settings, 'TOKEN_REFRESH_EXEMPT_PATHS', [])
+        self.exempt_prefixes = tuple(exempt)
 
     def __call__(self, request):
-        #print(f"--- Middleware running for path: {request.path} ---") # TEST 1
-        # 1. Grab tokens from the session
-        token = request.session.get('auth_token')
-        refresh_token = request.session.get('refresh_token')
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
-        #print(f"Token: {token}") # TEST 2
-        #print(f"Refresh Token: {refresh_token}") # TEST 2
-        # 2. If we have a token, check if it's "stale"
-        if token and refresh_token:
-            try:
-                # Decode without verification (we just want to read the 'exp' field)
-                decoded = jwt.decode(token, options={"verify_signature": False})
-                exp_timestamp = decoded.get('exp')
-                
-                # Convert timestamp to a datetime object
-                exp_time = datetime.datetime.fromtimestamp(exp_timestamp, datetime.timezone.utc)
-                now = datetime.datetime.now(datetime.timezone.utc)
-                
-                # 3. CRITICAL LOGIC: If token expires in less than 5 minutes, refresh it!
-                if exp_time - now < datetime.timedelta(minutes=REFRESH_TOKEN_EXPIRE_IN_LESS_THAN):
-                    #print("DEBUG: Token is expiring soon. Refreshing...") # TEST 2
-                    # Call your FastAPI refresh endpoint
-                    refresh_url = API_URL + "/refresh" # Adjust to your API URL
-                    res = requests.post(refresh_url, json={"refresh_token": refresh_token})
-                    
-                    if res.status_code == 200:
-                        # 4. Success! Save the new Access Token into the session
-                        new_access_token = res.json().get('access_token')
-                        request.session['auth_token'] = new_access_token
-                        #print("DEBUG: Token refreshed automatically by middleware.")
-            
-            except Exception as e:
-                # If anything goes wrong (API down, invalid token), 
-                # we just let the request continue and the views will handle the 401.
-                print(f"DEBUG: Middleware refresh failed: {e}")
+        # 0. Skip exempt paths entirely, without even loading the session
+        if not self._is_exempt(request):
+            token = self._expiring_token(request)
+            if token:
+                self._refresh(request.session, token)
 
         # 5. Let the request proceed to the view
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Same as __call__ for the ASGI stack; session and refresh I/O stay off the event loop
+        if not self._is_exempt(request):
+            token = await sync_to_async(self._expiring_token)(request)
+            if token:
+                await sync_to_async(self._refresh, thread_sensitive=False)(request.session, token)
+
+        return await self.get_response(request)
+
+    def _is_exempt(self, request):
+        return bool(self.exempt_prefixes) and request.path.startswith(self.exempt_prefixes)
+
+    def _expiring_token(self, request):
+        """Returns the session's access token if it's due for a refresh, else None."""
+        # 1. Grab the token and its cached expiry from the session
+        session = request.session
+        token = session.get('auth_token')
+        if not token:
+            return None
+
+        # 2. If we have a token, check if it's "stale"
+        exp = session.get('auth_token_exp')
+        if exp is None:
+            # Session from before we cached the expiry: decode once and remember it
+            exp = token_expiry(token) or False
+            session['auth_token_exp'] = exp
+
+        # 3. CRITICAL LOGIC: If token expires in less than 5 minutes, refresh it!
+        # The common case (far from expiry) stops at this comparison.
+        if exp and exp - time.time() < self.refresh_window:
+            return token
+        return None
+
+    def _refresh(self, session, token):
+        refresh_token = session.get('refresh_token')
+        if not refresh_token:
+            return
+
+        try:
+            # Concurrent requests of this session share a single /refresh call
+            new_access_token = refresh_access_token(refresh_token)
+
+            if new_access_token and new_access_token != token:
+                # 4. Success! Save the new Access Token (and its expiry) into the session
+                store_auth_token(session, new_access_token)
+
+        except Exception as e:
+            # If anything goes wrong (API down, invalid token),
+            # we just let the request continue and the views will handle the 401.
+            logger.warning("Token refresh in the middleware failed: %s", e)
@@ -0,0 +1,112 @@
+# junox/pagination.py
+"""
+Pagination shared by the list pages (device inventory, jobs).
+
+A PageWindow only describes the page being shown and a small window of
+page links around it, so building and rendering it costs the same for 10
+results or 10 million. It works in two modes:
+
+- numbered: the total is known, links go to ?page=N
+- cursor: the backend only hands out opaque next/prev cursors, links go to
+  ?cursor=... (for result sets too large to count)
+
+Render it with {% include 'junox/partials/pagination.html' with page=page %}.
+"""
+from urllib.parse import urlencode
+
+
+def page_number(request, param='page'):
+    """The requested page number, 1 if missing or garbage."""
+    try:
+        return max(int(request.GET.get(param, 1)), 1)
+    except (ValueError, TypeError):
+        return 1
+
+
+class PageWindow:
+    def __init__(self, request, per_page, number=1, total=None, window=2,
+                 next_cursor=None, prev_cursor=None):
+        self.per_page = per_page
+        self.window = window
+        self.total = total
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.is_cursor = total is None
+
+        if self.is_cursor:
+            self.number = None
+            self.last_page = None
+        else:
+            self.last_page = max((total + per_page - 1) // per_page, 1)
+            self.number = min(max(number, 1), self.last_page)
+
+        # Everything else in the query string (search, sort...) rides along on every link
+        self.params = [
+            (key, value) for key, value in request.GET.items()
+            if key not in ('page', 'cursor') and value != ''
+        ]
+        self.base_query = urlencode(self.params)
+
+    @classmethod
+    def cursor(cls, request, per_page, next_cursor=None, prev_cursor=None):
+        return cls(request, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+    @property
+    def offset(self):
+        return (self.number - 1) * self.per_page if not self.is_cursor else 0
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None if self.is_cursor else self.number > 1
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None if self.is_cursor else self.number < self.last_page
+
+    @property
+    def has_other_pages(self):
+        return self.has_prev or self.has_next
+
+    def _url(self, **param):
+        query = urlencode(self.params + list(param.items()))
+        return f'?{query}'
+
+    @property
+    def prev_url(self):
+        if not self.has_prev:
+            return None
+        if self.is_cursor:
+            return self._url(cursor=self.prev_cursor)
+        return self._url(page=self.number - 1)
+
+    @property
+    def next_url(self):
+        if not self.has_next:
+            return None
+        if self.is_cursor:
+            return self._url(cursor=self.next_cursor)
+        return self._url(page=self.number + 1)
+
+    @property
+    def links(self):
+        """
+        Page links around the current page, always including the first and
+        last page: [{'number': 1, 'url': ...}, {'gap': True}, {'number': 7, ...}, ...]
+        """
+        if self.is_cursor:
+            return []
+
+        first = max(self.number - self.window, 1)
+        last = min(self.number + self.window, self.last_page)
+
+        numbers = list(range(first, last + 1))
+        if first > 1:
+            numbers = [1, None] + numbers if first > 2 else [1] + numbers
+        if last < self.last_page:
+            numbers += [None, self.last_page] if last < self.last_page - 1 else [self.last_page]
+
+        return [
+            {'gap': True} if n is None else
+            {'number': n, 'url': self._url(page=n), 'current': n == self.number}
+            for n in numbers
+        ]
@@ -0,0 +1,190 @@
+# junox/search.py
+"""
+In-memory search indexes for the device inventory and the job history.
+
+Built once per inventory snapshot (keyed by the data version the service
+layer returns) and reused by every search until the inventory changes:
+
+- each device gets one pre-lowered haystack of its searchable fields, so a
+  query never lower-cases or str()s device fields again;
+- a trigram -> device positions map narrows a query of 3+ characters down to
+  the devices sharing its rarest trigram before any substring check runs.
+
+Shorter queries match too many devices for an index to help and are answered
+with a plain scan over the prepared haystacks. Job history gets the same
+per-snapshot treatment for its search haystacks and sort keys (JobIndex).
+"""
+import datetime
+import heapq
+import threading
+from collections import OrderedDict
+
+from .concurrency import SingleFlight
+
+# Separates fields in a haystack so a match can't span two fields
+_SEP = '\x00'
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class DeviceSearchIndex:
+    def __init__(self, devices, fields):
+        self.devices = devices
+        self._haystacks = [
+            _SEP.join(str(d.get(field, '')).lower() for field in fields)
+            for d in devices
+        ]
+
+        self._postings = {}
+        for position, haystack in enumerate(self._haystacks):
+            for gram in _trigrams(haystack):
+                self._postings.setdefault(gram, []).append(position)
+
+    def search(self, query):
+        """Returns the devices whose fields contain `query` (case-insensitive), in inventory order."""
+        needle = query.lower()
+        haystacks = self._haystacks
+
+        if len(needle) < 3:
+            positions = [i for i, haystack in enumerate(haystacks) if needle in haystack]
+        else:
+            candidates = None
+            for gram in _trigrams(needle):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    return []
+                if candidates is None or len(posting) < len(candidates):
+                    candidates = posting
+            positions = [i for i in candidates if needle in haystacks[i]]
+
+        return [self.devices[i] for i in positions]
+
+
+class JobIndex:
+    """
+    Search and sort support for one job-history snapshot.
+
+    Sort keys are computed once per field and snapshot: timestamps are parsed
+    into epoch seconds, numbers stay numbers and everything else is compared
+    as lower-cased text, so mixed-type fields still sort instead of raising.
+    A page is then picked with heapq (O(N log k) for the k rows up to the
+    requested page) rather than sorting the whole history.
+    """
+
+    def __init__(self, jobs, search_fields):
+        self.jobs = jobs
+        self._haystacks = [
+            _SEP.join(str(j.get(field, '')).lower() for field in search_fields)
+            for j in jobs
+        ]
+        self._sort_keys = {}
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def _keys(self, field):
+        keys = self._sort_keys.get(field)
+        if keys is None:
+            keys = [_typed_key(j.get(field)) for j in self.jobs]
+            with self._lock:
+                self._sort_keys[field] = keys
+        return keys
+
+    def latest_change(self):
+        """Epoch seconds of the newest created_at/ended_at in the snapshot, or None."""
+        if self._latest is None:
+            stamps = [job_timestamp(j) for j in self.jobs]
+            self._latest = max((s for s in stamps if s is not None), default=False)
+        return self._latest or None
+
+    def page(self, search, sort, descending, offset, limit):
+        """Returns (jobs on the page, number of jobs matching `search`)."""
+        positions = range(len(self.jobs))
+        if search:
+            needle = search.lower()
+            positions = [i for i in positions if needle in self._haystacks[i]]
+
+        wanted = offset + limit
+        if sort:
+            keys = self._keys(sort)
+            if descending:
+                # Missing values still go last: flip their flag for nlargest
+                top = heapq.nlargest(wanted, positions, key=lambda i: (not keys[i][0],) + keys[i][1:])
+            else:
+                top = heapq.nsmallest(wanted, positions, key=keys.__getitem__)
+        else:
+            top = positions[:wanted]
+
+        return [self.jobs[i] for i in top[offset:wanted]], len(positions)
+
+
+def parse_timestamp(value):
+    """Epoch seconds of an ISO timestamp string, or None if it isn't one."""
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if parsed.tzinfo is None:
+        # FastAPI sends naive UTC timestamps
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def job_timestamp(job):
+    """When `job` last changed as far as we can tell: its ended_at, else created_at."""
+    stamps = [parse_timestamp(job.get(field)) for field in ('created_at', 'ended_at')]
+    return max((s for s in stamps if s is not None), default=None)
+
+
+def _typed_key(value):
+    """(missing, kind, value) so any two keys compare without a TypeError."""
+    if value is None or value == '':
+        return (True, 0, 0)
+    if isinstance(value, bool):
+        return (False, 0, int(value))
+    if isinstance(value, (int, float)):
+        return (False, 0, value)
+    if isinstance(value, str):
+        timestamp = parse_timestamp(value)
+        if timestamp is None:
+            return (False, 1, value.lower())
+        return (False, 0, timestamp)
+    return (False, 1, str(value).lower())
+
+
+_MAX_INDEXES = 4
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+_builds = SingleFlight()
+
+
+def _build(key, builder, args):
+    index = builder(*args)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _get_index(key, builder, *args):
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    return _builds.do(key, _build, key, builder, args)
+
+
+def get_device_index(version, devices, fields):
+    """
+    Returns the search index for inventory snapshot `version`, building it
+    from `devices` the first time that version is seen in this process.
+    """
+    return _get_index(('devices', version), DeviceSearchIndex, devices, fields)
+
+
+def get_job_index(version, jobs, search_fields):
+    """Same as get_device_index(), for a job-history snapshot."""
+    return _get_index(('jobs', version), JobIndex, jobs, search_fields)
@@ -1,43 +1,173 @@
+import logging
+
 import requests
 from django.conf import settings
 
+from .api_client import api_get, api_post
+from .api_cache import CachedResponse, cached_get, invalidate, remember
+from .concurrency import map_bounded
+from .search import get_device_index, get_job_index, job_timestamp
+
 
 API_URL = settings.API_URL
 
+logger = logging.getLogger(__name__)
+
+
+# Fields the inventory search matches against, and the ones it can be sorted by
+DEVICE_SEARCH_FIELDS = ('hostname', 'ip_address', 'serialnumber', 'model')
+DEVICE_SORT_FIELDS = ('id', 'hostname', 'ip_address', 'type', 'vendor', 'model', 'os_version',
+                      'serialnumber', 'region', 'site', 'sync_status')
+
+# None until the first /devices response tells us whether FastAPI pages server-side
+_server_paging = {'supported': None}
 
-def get_device_list(token):
+
+def get_device_list(token, search=None, offset=None, limit=None, sort=None):
     """
     Fetches the inventory from FastAPI.
     The middleware ensures the token passed here is fresh.
+
+    search/offset/limit/sort are passed through as query parameters for
+    backends that filter and page server-side; without them (or on a
+    backend that ignores them) the full device list comes back.
     """
+    response = _fetch_devices(token, search=search, offset=offset, limit=limit, sort=sort)
+    return response.data if response is not None else None
+
+
+def _fetch_devices(token, **query):
+    # The cached /devices response (data + version), or None if unreachable
     url = f"{API_URL}/devices"
-    headers = {"Authorization": f"Bearer {token}"}
+    params = {key: value for key, value in query.items() if value not in (None, '')}
     
     try:
-        response = requests.get(url, headers=headers, timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        return []
+        response = cached_get('devices', url, token=token, params=params, timeout=5)
+        if response.ok:
+            return response
+        return CachedResponse(response.status_code, [])
     except requests.exceptions.RequestException as e:
-        print(f"API Error: {e}")
+        logger.warning("API error: %s", e)
         return None
 
 
+def _paging_enabled(setting, detected):
+    mode = str(getattr(settings, setting, 'auto')).lower()
+    if mode == 'auto':
+        # Keep asking until a response shows what the backend does
+        return detected['supported'] is not False
+    return mode in ('1', 'true', 'yes', 'on')
+
+
+def _page_devices_locally(devices, version, search, offset, limit, sort):
+    if search:
+        # The index for this inventory snapshot is built once and reused until it changes
+        devices = get_device_index(version, devices, DEVICE_SEARCH_FIELDS).search(search)
+
+    if sort:
+        field = sort.lstrip('-')
+        # Missing values sort last; str() so mixed types never make sort() raise
+        devices = sorted(
+            devices,
+            key=lambda d: (d.get(field) is None, str(d.get(field, '')).lower()),
+            reverse=sort.startswith('-'),
+        )
+
+    return {'devices': devices[offset:offset + limit], 'total': len(devices)}
+
+
+def _server_page(data):
+    # A page FastAPI filtered and sliced itself, rather than the whole inventory
+    return isinstance(data, dict) and ('total' in data or 'next_cursor' in data)
+
+
+def _device_list(data):
+    # The whole inventory: a plain list, or one wrapped in an object without paging fields
+    if isinstance(data, dict):
+        data = data.get('items', data.get('devices'))
+    return data if isinstance(data, list) else []
+
+
+def _ignored_paging(query, response, detected):
+    """
+    True for the first response showing that FastAPI ignored the paging
+    parameters in `query` (`detected` is _server_paging or _jobs_server_paging):
+    the caller files it under the unpaged request's cache key
+    (api_cache.remember), which every later request uses.
+    """
+    return (bool(query) and detected['supported'] is None
+            and response is not None and response.ok and not _server_page(response.data))
+
+
+def get_device_page(token, search='', offset=0, limit=15, sort=None, cursor=None):
+    """
+    Returns one page of the (optionally filtered and sorted) inventory as
+    {'devices': [...], 'total': <matching device count>, 'version': <data
+    version>}, or None if the API is unreachable.
+
+    Filtering, sorting and slicing happen in FastAPI when it answers with a
+    paged object ({'items': [...], 'total': N}); when it returns a plain list
+    we fall back to doing it here, and stop sending the paging parameters.
+    A cursor-paged backend may leave out the total and return
+    'next_cursor'/'prev_cursor' instead, which are passed back as-is.
+    """
+    sort, query = _device_page_query(search, offset, limit, sort, cursor)
+    response = _fetch_devices(token, **query)
+    if _ignored_paging(query, response, _server_paging):
+        remember('devices', f"{API_URL}/devices", response, token=token)
+    return _device_page_from(response, search, offset, limit, sort)
+
+
+def _device_page_query(search, offset, limit, sort, cursor):
+    # (validated sort, query parameters to send to /devices)
+    if sort and sort.lstrip('-') not in DEVICE_SORT_FIELDS:
+        sort = None
+
+    if not _paging_enabled('API_DEVICES_SERVER_PAGING', _server_paging):
+        return sort, {}
+    if cursor:
+        return sort, {'search': search, 'cursor': cursor, 'limit': limit, 'sort': sort}
+    return sort, {'search': search, 'offset': offset, 'limit': limit, 'sort': sort}
+
+
+def _device_page_from(response, search, offset, limit, sort):
+    # Shapes a /devices response into a page, shared with async_services
+    if response is None:
+        return None
+    data = response.data
+
+    if _server_page(data):
+        _server_paging['supported'] = True
+        page = {
+            'devices': data.get('items', data.get('devices', [])),
+            'total': data.get('total'),
+            'next_cursor': data.get('next_cursor'),
+            'prev_cursor': data.get('prev_cursor'),
+        }
+    else:
+        if data and _server_paging['supported'] is None:
+            _server_paging['supported'] = False
+        page = _page_devices_locally(_device_list(data), response.version, search, offset, limit, sort)
+
+    page['version'] = response.version
+    return page
+
+
 def get_device_interfaces(token, device_id):
     """
     Fetches a single device interfaces from FastAPI.
     The middleware ensures the token passed here is fresh.
     """
     url = f"{API_URL}/interfaces/{device_id}/interfaces_db"
-    headers = {"Authorization": f"Bearer {token}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=5)
-        if response.status_code == 200:
-            return response.json()
+        response = cached_get('interfaces', url, token=token, timeout=5)
+        if response.ok:
+            # The version keys the cached interface table in device_detail.html
+            return dict(response.data, version=response.version)
         return None
     except requests.exceptions.RequestException as e:
-        print(f"API Error: {e}")
+        logger.warning("API error: %s", e)
         return None
 
 
@@ -46,46 +176,78 @@ def service_get_device_vlans(token, device_id):
     Fetches a single device vlans from FastAPI.
     """
     url = f"{API_URL}/vlans/{device_id}/fetch_vlans_db"
-    headers = {"Authorization": f"Bearer {token}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=5)
-        if response.status_code == 200:
-            return response.json()
+        response = cached_get('device_vlans', url, token=token, timeout=5)
+        if response.ok:
+            return response.data
         return None
     except requests.exceptions.RequestException as e:
-        print(f"API Error: {e}")
+        logger.warning("API error: %s", e)
         return None
 
 def service_assign_vlan(token, device_id, interface_name, vlan_id):
     """
     Assigns a VLAN to an interface on a device using FastAPI.
     """
-    url = f"{API_URL}/vlans/access_vlan/{device_id}/{vlan_id}?interface_name={interface_name}"
-    headers = {
-            'accept': 'application/json',
-            'Authorization': f'Bearer {token}',
-            
-        }
+    result = _post_assign_vlan(token, device_id, interface_name, vlan_id)
+    if result["success"]:
+        # The port's VLAN changes and a new job shows up
+        invalidate('interfaces', 'device_vlans', 'jobs', 'job_changes')
+    return result
+
+
+def _post_assign_vlan(token, device_id, interface_name, vlan_id):
+    url = f"{API_URL}/vlans/access_vlan/{device_id}/{vlan_id}"
+    headers = {'accept': 'application/json'}
     try:
-        response = requests.post(url, headers=headers, timeout=10)
+        response = api_post(url, token=token, headers=headers, params={'interface_name': interface_name}, timeout=10)
         if response.status_code == 200:
-            return {"success": True, "data": response.json()}
+            data = _json_body(response)
+            return {"success": True, "data": data, "job_id": _job_id(data)}
         return {"success": False, "error": "Failed to assign VLAN"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+
+def service_assign_vlans_bulk(token, assignments):
+    """
+    Assigns many VLANs at once. `assignments` is a list of
+    {'device_id', 'interface_name', 'vlan_id'} dicts; returns one result per
+    assignment, in order: the same dict plus 'success' and 'job_id' or 'error'.
+
+    FastAPI takes one interface per call, so the calls run concurrently (at
+    most API_BULK_CONCURRENCY at a time) and the cached interfaces, VLANs
+    and jobs are invalidated once at the end instead of once per port.
+    """
+    def assign(item):
+        return _post_assign_vlan(token, item['device_id'], item['interface_name'], item['vlan_id'])
+
+    results = []
+    for item, outcome in zip(assignments, map_bounded(assign, assignments)):
+        if isinstance(outcome, Exception):
+            outcome = {"success": False, "error": str(outcome)}
+        result = dict(item, success=outcome["success"])
+        if outcome["success"]:
+            result["job_id"] = outcome["job_id"]
+        else:
+            result["error"] = outcome["error"]
+        results.append(result)
+
+    if any(result["success"] for result in results):
+        invalidate('interfaces', 'device_vlans', 'jobs', 'job_changes')
+    return results
+
 def service_get_vlan_catalog(token):
     """
     Fetches the VLAN catalog from FastAPI.
     """
     url = f"{API_URL}/vlans/get_vlan_catalog_db"
-    headers = {"Authorization": f"Bearer {token}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            return {"success": True, "vlans": response.json()}
+        response = cached_get('vlan_catalog', url, token=token, timeout=10)
+        if response.ok:
+            return {"success": True, "vlans": response.data, "version": response.version}
         return {"success": False, "error": "Failed to fetch VLAN catalog"}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -96,46 +258,256 @@ def service_get_all_jobs(token):
     Fetches the job list from FastAPI.
     """
     url = f"{API_URL}/other/jobs/all"
-    headers = {"Authorization": f"Bearer {token}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            return {"success": True, "jobs": response.json()}
+        response = cached_get('jobs', url, token=token, timeout=10)
+        if response.ok:
+            return {"success": True, "jobs": response.data, "version": response.version}
         return {"success": False, "error": "Failed to fetch jobs"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+JOB_SEARCH_FIELDS = ('id', 'target')
+JOB_SORT_FIELDS = ('created_at', 'ended_at', 'id', 'task_type', 'target', 'status')
+
+_jobs_server_paging = {'supported': None}
+
+
+def service_get_jobs_page(token, search='', sort='created_at', order='desc', offset=0, limit=15):
+    """
+    Fetches one page of the job history as
+    {"success": True, "jobs": [...], "total": N, "version": ...}.
+
+    Like get_device_page(): FastAPI filters, sorts and pages when it answers
+    /other/jobs/all with {'items': [...], 'total': N}; otherwise we do it
+    here on the cached full history, with precomputed sort keys and a top-k
+    selection instead of a full sort.
+    """
+    sort, order, params = _jobs_page_query(search, sort, order, offset, limit)
+    url = f"{API_URL}/other/jobs/all"
+
+    try:
+        response = cached_get('jobs', url, token=token, params=params, timeout=10)
+        if not response.ok:
+            return {"success": False, "error": "Failed to fetch jobs"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    if _ignored_paging(params, response, _jobs_server_paging):
+        remember('jobs', url, response, token=token)
+    return _jobs_page_from(response, search, sort, order, offset, limit)
+
+
+def _jobs_page_query(search, sort, order, offset, limit):
+    # (validated sort, order, query parameters to send to /other/jobs/all)
+    if sort not in JOB_SORT_FIELDS:
+        sort = 'created_at'
+    order = 'asc' if order == 'asc' else 'desc'
+
+    params = None
+    if _paging_enabled('API_JOBS_SERVER_PAGING', _jobs_server_paging):
+        params = {'search': search or None, 'sort': sort, 'order': order, 'offset': offset, 'limit': limit}
+        params = {key: value for key, value in params.items() if value is not None}
+    return sort, order, params
+
+
+def _jobs_page_from(response, search, sort, order, offset, limit):
+    # Shapes a /other/jobs/all response into a page, shared with async_services
+    # "cursor" is the newest job change in the snapshot, where the page's live
+    # updates (job_stream) pick up from
+    data = response.data
+    if isinstance(data, dict) and 'total' in data:
+        _jobs_server_paging['supported'] = True
+        jobs, total = data.get('items', data.get('jobs', [])), data['total']
+        cursor = max((s for s in map(job_timestamp, jobs) if s is not None), default=None)
+    else:
+        if data and _jobs_server_paging['supported'] is None:
+            _jobs_server_paging['supported'] = False
+        index = get_job_index(response.version, data, JOB_SEARCH_FIELDS)
+        jobs, total = index.page(search, sort, order == 'desc', offset, limit)
+        cursor = index.latest_change()
+
+    return {"success": True, "jobs": jobs, "total": total, "version": response.version, "cursor": cursor}
+
+
+# None until a job watcher's response shows whether FastAPI filters by ids/since
+_jobs_filtering = {'supported': None}
+
+
+def service_get_job_changes(token, ids=(), since=None):
+    """
+    The jobs a live job view watches (job_stream): the ones in `ids` and
+    those changed after `since`, as {"success": True, "jobs": [...]}.
+
+    When FastAPI filters /other/jobs/all by ids/since only those come back;
+    a backend that ignores the filter answers with its whole history, which
+    is noticed and the unfiltered history is read from then on. The caller
+    picks the watched jobs out either way (JobChanges). Cached in its own
+    'job_changes' group, whose TTL is shorter than a watcher's poll: the
+    jobs list's 10 seconds would hide a status change for several ticks.
+    """
+    params = _job_changes_query(ids, since)
+    url = f"{API_URL}/other/jobs/all"
+
+    try:
+        response = cached_get('job_changes', url, token=token, params=params, timeout=10)
+        if not response.ok:
+            return {"success": False, "error": "Failed to fetch jobs"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    return {"success": True, "jobs": _job_changes_from(response, ids, since, params)}
+
+
+def _job_changes_query(ids, since):
+    # Query parameters narrowing /other/jobs/all to the watched jobs, or None
+    if not _paging_enabled('API_JOBS_FILTERING', _jobs_filtering):
+        return None
+    params = {}
+    if ids:
+        params['ids'] = ','.join(sorted(ids))
+    if since is not None:
+        params['since'] = f'{since:f}'
+    return params or None
+
+
+def _job_matches(job, ids, since):
+    if str(job.get('id')) in ids:
+        return True
+    stamp = job_timestamp(job)
+    return since is not None and stamp is not None and stamp > since
+
+
+def _job_changes_from(response, ids, since, params):
+    # The job list of a /other/jobs/all response, shared with async_services
+    jobs = response.data
+    if isinstance(jobs, dict):
+        # Server-paged backend
+        jobs = jobs.get('items', jobs.get('jobs', []))
+
+    if params and jobs and _jobs_filtering['supported'] is None:
+        # Anything we didn't ask for means the filter was ignored
+        ids = {str(job_id) for job_id in ids}
+        _jobs_filtering['supported'] = all(_job_matches(job, ids, since) for job in jobs)
+    return jobs
+
+
 def service_add_device(token, hostname, username, password, session_id):
     """
     Adds a new device to the inventory using FastAPI.
     """
-    url = f"{API_URL}/devices/provision/{hostname}"
-    headers = {
-            'accept': 'application/json',
-            'Authorization': f'Bearer {token}',
+    url, payload = _provision_request(hostname, username, password, session_id)
+    headers = {'accept': 'application/json'}
+
+    try:
+        response = api_post(url, token=token, headers=headers, json=payload, timeout=15)
+        result = _provision_result(response)
+        if result["success"]:
+            # A new device (and its provisioning job) is on its way
+            invalidate('devices', 'stats', 'jobs', 'job_changes')
+        return result
             
-        }
-    
+    except requests.exceptions.RequestException as e:
+        return {"success": False, "error": f"API Connection Error: {str(e)}"}
+
+
+def _provision_request(hostname, username, password, session_id=None):
+    # Shared with the bulk import (bulk_import.py)
+    url = f"{API_URL}/devices/provision/{hostname}"
+
     # Form-urlencoded data, we move data to payload, don't prefer in the URL.
     payload = {
             'username': username,
             'password': password,
             'session_id': session_id
         }
+    return url, payload
 
+
+def _json_body(response):
+    # The parsed body, or None when it isn't JSON (an HTML error page from a proxy...)
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        
-        # Return a dictionary so the view knows exactly what happened
-        if response.status_code in [200, 201,202]:
-            return {"success": True, "data": response.json()}
-        else:
-            # Capture the error message from FastAPI if available
-            error_msg = response.json().get('detail', 'Provisioning failed')
-            return {"success": False, "error": error_msg}
-            
+        return response.json()
+    except ValueError:
+        return None
+
+
+def _job_id(data):
+    # FastAPI answers job-starting calls with {"job_id": ...}; any other body has none
+    return data.get('job_id') if isinstance(data, dict) else None
+
+
+def _provision_result(response):
+    # Return a dictionary so the view knows exactly what happened
+    data = _json_body(response)
+    if response.status_code in [200, 201,202]:
+        return {"success": True, "data": data, "job_id": _job_id(data)}
+
+    # Capture the error message from FastAPI if available; the body may also be
+    # a bare string or list, or not JSON at all
+    detail = data.get('detail') if isinstance(data, dict) else data
+    return {"success": False, "error": str(detail) if detail else 'Provisioning failed'}
+
+
+
+def service_get_inventory_stats(token):
+    """
+    Fetches the aggregated inventory stats used by the main dashboard.
+    """
+    url = f"{API_URL}/devices/inventory/stats"
+
+    try:
+        # Short timeout so the dashboard doesn't hang if the API is down
+        response = cached_get('stats', url, token=token, timeout=3)
+        if response.ok:
+            return {"success": True, "stats": response.data, "version": response.version}
+        return {"success": False, "error": f"Error fetching stats: {response.status_code}"}
     except requests.exceptions.RequestException as e:
-        return {"success": False, "error": f"API Connection Error: {str(e)}"}
+        return {"success": False, "error": f"API Connection Error: {e}"}
+
+
+def service_get_api_health():
+    """
+    Fetches the backend status/version from FastAPI's /health endpoint.
+    Returns None if the API can't be reached.
+    """
+    url = f"{settings.API_ROOT}/health"
+
+    try:
+        # Short timeout, this only ever runs in the background refresher
+        response = api_get(url, timeout=getattr(settings, 'API_HEALTH_TIMEOUT', 0.5))
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+def service_ping(token):
+    """
+    Asks FastAPI whether it still accepts `token`.
+    Returns the /ping status code, or None if the API can't be reached.
+    """
+    url = f"{API_URL}/ping"
+
+    try:
+        response = api_get(url, token=token, timeout=getattr(settings, 'SESSION_PING_TIMEOUT', 2))
+        return response.status_code
+    except requests.exceptions.RequestException:
+        return None
+
+
+def service_refresh_token(refresh_token):
+    """
+    Exchanges a refresh token for a new access token.
+    Returns the new access token, or None if FastAPI refused it.
+    """
+    url = f"{API_URL}/refresh"
 
+    # Bounded timeout: this runs inside the middleware, in front of every view
+    response = api_post(url, json={"refresh_token": refresh_token},
+                        timeout=getattr(settings, 'API_REFRESH_TIMEOUT', 3))
+    if response.status_code == 200:
+        return response.json().get('access_token')
+    return None
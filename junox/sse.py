@@ -0,0 +1,74 @@
+# junox/sse.py
+"""
+Server-Sent Events plumbing shared by the streaming endpoints
+(log_relay, job_stream, bulk_import).
+"""
+import asyncio
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .async_client import close_async_client
+
+
+def event(lines, event=None, id=None):
+    """One SSE frame: every item of `lines` becomes a data: line."""
+    parts = [f"event: {event}"] if event else []
+    if id is not None:
+        parts.append(f"id: {id}")
+    for line in lines:
+        # One data: field per line; a line break inside a field would end it early
+        parts.extend(f"data: {part}" for part in (line.splitlines() or ['']))
+    return ("\n".join(parts) + "\n\n").encode()
+
+
+def comment(text):
+    """A frame the browser ignores: keeps the connection (and proxies) alive."""
+    return f": {text}\n\n".encode()
+
+
+def iterate_blocking(frames):
+    """
+    Drives an async frame iterator from a WSGI worker thread (runserver),
+    where Django would otherwise collect the whole stream before sending it.
+    The loop lives as long as the stream, and so does its backend client
+    (async_client keeps one per loop), which is closed with it.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(frames.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(frames.aclose())
+        # Let cancelled helper tasks finish before the loop goes away
+        pending = asyncio.all_tasks(loop)
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.run_until_complete(close_async_client())
+        loop.close()
+
+
+def streams_supported(request):
+    """
+    True under ASGI, where an open stream is a task on the event loop.
+    Under WSGI each one holds a worker thread until it ends.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def stream_response(request, frames):
+    """
+    StreamingHttpResponse for an async iterator of SSE frames. Under ASGI
+    the stream is just a task on the event loop; under WSGI it holds the
+    worker thread for as long as it's open.
+    """
+    if not streams_supported(request):
+        frames = iterate_blocking(frames)
+
+    response = StreamingHttpResponse(frames, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Tell nginx not to buffer the stream
+    return response
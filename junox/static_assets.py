@@ -0,0 +1,127 @@
+# junox/static_assets.py
+"""
+Static assets built for far-future caching.
+
+With JUNOX_HASHED_STATIC, collectstatic writes every file under a
+content-hashed name (junox/css/main.3f1c2a9b8e7d.css, which is what
+{% static %} then renders) plus precompressed .gz and .br copies of the
+text assets. A hashed name never changes content, so it can be cached
+as immutable: repeat visits load no asset bytes at all, and a new build
+gets new names.
+
+serve() hands those files out from STATIC_ROOT for deployments without
+nginx in front (JUNOX_SERVE_STATIC). Brotli needs the optional `brotli`
+package; without it only .gz copies are made.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment
+    brotli = None
+
+# Worth compressing; images other than SVG and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico')
+COMPRESS_MIN_BYTES = 512
+
+# (Content-Encoding, file suffix), best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz/.br copies of each hashed text file."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        # Only the final hashed names: CSS goes through several passes (and names)
+        # while its url()s are rewritten
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._write_compressed(hashed_name)
+
+    def _write_compressed(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return
+
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            # A copy that saves next to nothing isn't worth a Content-Encoding
+            if len(compressed) < len(data) * 0.9:
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+
+@lru_cache(maxsize=1)
+def _hashed_names():
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def _accepted(request):
+    accept = request.headers.get('Accept-Encoding', '')
+    return {part.split(';', 1)[0].strip().lower() for part in accept.split(',')}
+
+
+def serve(request, path):
+    """
+    A collected static file: the .br or .gz copy when the browser takes it,
+    immutable caching for hashed names, Last-Modified revalidation for the rest.
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if not os.path.isfile(fullpath):
+        raise Http404(path)
+
+    served, encoding = fullpath, None
+    accepted = _accepted(request)
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and os.path.isfile(fullpath + suffix):
+            served, encoding = fullpath + suffix, coding
+            break
+
+    stat = os.stat(served)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    # Content type of the original file, whichever copy goes out
+    content_type, _ = mimetypes.guess_type(fullpath)
+    response = FileResponse(open(served, 'rb'), content_type=content_type or 'application/octet-stream')
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    if name in _hashed_names():
+        response['Cache-Control'] = IMMUTABLE
+    else:
+        response['Cache-Control'] = 'no-cache'
+    return response
@@ -1,3 +1,1353 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock, skipIf
+from urllib.parse import urlsplit
 
-# Create your tests here.
+import httpx
+import jwt
+import requests
+from django.contrib.sessions.backends.cache import SessionStore
+from django.contrib.sessions.backends.db import SessionStore as DbSessionStore
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.template import Engine
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import (api_cache, api_client, async_views, breaker, bulk_import, cache_warmer, compression, context_processors,
+               job_stream, log_relay, search, services, sse, static_assets, tokens, views)
+from .api_client import ApiClient, api_get
+from .concurrency import SingleFlight, agather, gather, map_bounded
+from .pagination import PageWindow, page_number
+from .tokens import store_auth_token
+
+try:
+    import websockets.asyncio.server
+except ImportError:  # pragma: no cover - depends on the deployment
+    websockets = None
+
+
+def make_token(expires_in=600, sub='admin'):
+    return jwt.encode({'sub': sub, 'exp': int(time.time()) + expires_in}, 'junox-tests-signing-key-0123456789', algorithm='HS256')
+
+
+DEVICES = [
+    {'id': i, 'hostname': f'sw-{i:03d}', 'ip_address': f'10.0.0.{i}', 'serialnumber': f'SN{i:05d}',
+     'model': 'ex4300', 'vendor': 'juniper', 'type': 'switch', 'os_version': '23.4R1', 'sync_status': 'synced'}
+    for i in range(1, 41)
+]
+JOBS = [
+    {'id': f'job-{i:03d}', 'task_type': 'assign_vlan', 'target': f'10.0.0.{i}', 'status': 'completed',
+     'created_at': f'2026-01-01T10:{i:02d}:00', 'ended_at': f'2026-01-01T11:{i:02d}:00', 'result': {'status': 'ok'}}
+    for i in range(1, 31)
+]
+
+
+class FakeBackend:
+    """
+    Stands in for FastAPI at the requests.Session level, below ApiClient's
+    retries, breaker and metrics. `routes` maps (method, path) to a body, a
+    (status, body) pair, an exception to raise or a callable returning one
+    of those; `calls` records every request. Bodies carry an ETag and
+    If-None-Match gets a 304, like FastAPI behind its caching middleware.
+    `arequest` serves the same routes to httpx.AsyncClient.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = {
+            ('GET', '/health'): {'version': '1.2.3', 'title': 'JunoX API', 'status': 'online'},
+            ('GET', '/api/v1/ping'): {'ok': 1},
+            ('GET', '/api/v1/devices'): DEVICES,
+            ('GET', '/api/v1/devices/inventory/stats'): {
+                'total_devices': len(DEVICES), 'operational_count': len(DEVICES), 'failed_count': 0,
+                'pending_count': 0, 'global': {'vendor': {'juniper': len(DEVICES)}},
+                'os_by_vendor': {'juniper': {'23.4': len(DEVICES)}}},
+            ('GET', '/api/v1/interfaces/1/interfaces_db'): {'interfaces': [
+                {'interface_name': f'ge-0/0/{i}', 'admin_status': 'up', 'oper_status': 'up',
+                 'interface_tagness': 'untagged'} for i in range(4)]},
+            ('GET', '/api/v1/vlans/1/fetch_vlans_db'): [{'vlan_id': v, 'vlan_name': f'v{v}'} for v in range(1, 5)],
+            ('GET', '/api/v1/vlans/get_vlan_catalog_db'): [
+                {'vlan_id': v, 'name': f'v{v}', 'category': 'Data'} for v in range(1, 5)],
+            ('GET', '/api/v1/other/jobs/all'): JOBS,
+            ('POST', '/api/v1/token'): {'access_token': make_token(), 'refresh_token': make_token(3600)},
+            ('POST', '/api/v1/refresh'): {'access_token': make_token()},
+        }
+        self.routes.update(routes or {})
+        self.calls = []
+
+    def __call__(self, session, method, url, **kwargs):
+        path = urlsplit(url).path
+        self.calls.append((method, path, kwargs))
+        reply = self.routes.get((method, path), (404, {'detail': 'Not Found'}))
+        if callable(reply) and not isinstance(reply, type):
+            reply = reply(**kwargs)
+        if isinstance(reply, Exception) or isinstance(reply, type) and issubclass(reply, Exception):
+            raise reply
+        status, body = reply if isinstance(reply, tuple) else (200, reply)
+
+        response = requests.Response()
+        response.url = url
+        content = json.dumps(body).encode()
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        response.headers['ETag'] = etag
+        if (kwargs.get('headers') or {}).get('If-None-Match') == etag:
+            response.status_code, response._content = 304, b''
+            return response
+        response.status_code = status
+        response._content = content
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    def count(self, method, path):
+        return sum(1 for call in self.calls if call[:2] == (method, path))
+
+    async def arequest(self, client, method, url, **kwargs):
+        # The same routes for httpx.AsyncClient, so AsyncApiClient runs for real on top
+        request = httpx.Request(method, str(url))
+        try:
+            response = self(None, method, str(url), **kwargs)
+        except requests.exceptions.RequestException as e:
+            raise httpx.ConnectError(str(e), request=request)
+        return httpx.Response(response.status_code, headers=dict(response.headers),
+                              content=response.content, request=request)
+
+
+class BackendTestCase(TestCase):
+    """
+    Each test gets an empty cache, closed breakers, undetected backend
+    features, a backend badge that doesn't re-check /health in the
+    background, and a FakeBackend patched in as `self.backend`.
+    """
+
+    def setUp(self):
+        cache.clear()
+        breaker._breakers.clear()
+        for detected in (services._server_paging, services._jobs_server_paging, services._jobs_filtering):
+            detected['supported'] = None
+            self.addCleanup(detected.update, supported=None)
+        context_processors._health.update(info={'version': 'v1.2.3', 'title': 'JunoX API', 'status': 'online'},
+                                          checked_at=time.time() + 3600)
+        self.addCleanup(context_processors._health.update, info=None, checked_at=0.0)
+
+        self.backend = FakeBackend()
+        # A plain function, so the patched method still receives the session
+        patcher = mock.patch('requests.Session.request',
+                             new=lambda session, *args, **kwargs: self.backend(session, *args, **kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('httpx.AsyncClient.request',
+                             new=lambda client, *args, **kwargs: self.backend.arequest(client, *args, **kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self):
+        response = self.client.post(reverse('junox:login_junox'), {'username': 'admin', 'password': 'x'})
+        self.assertRedirects(response, reverse('junox:dashboard'), fetch_redirect_response=False)
+
+
+class SessionStoreTests(BackendTestCase):
+    PAGES = ('junox:dashboard', 'junox:device_dashboard', 'junox:jobs_list', 'junox:vlan_catalog')
+
+    def walk(self):
+        with CaptureQueriesContext(connection) as queries:
+            for name in self.PAGES:
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+            response = self.client.get(reverse('junox:device_detail', args=[1, 'sw-001']))
+            self.assertEqual(response.status_code, 200)
+        return queries
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    def test_cache_store_pages_run_no_queries(self):
+        self.login()
+        self.assertEqual(len(self.walk()), 0)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_store_pages_run_no_queries(self):
+        self.login()
+        self.assertEqual(len(self.walk()), 0)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_db_store_only_reads(self):
+        self.login()
+        queries = self.walk()
+        self.assertFalse([q for q in queries.captured_queries if not q['sql'].startswith('SELECT')])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_store_never_holds_the_refresh_token(self):
+        with mock.patch.object(views, 'SESSION_KEEPS_REFRESH_TOKEN', False), \
+                mock.patch.object(views, 'SESSION_STARTED_JOBS', 8):
+            self.login()
+            session = self.client.session
+            self.assertIn('auth_token', session)
+            self.assertNotIn('refresh_token', session)
+
+            request = mock.Mock(session=session)
+            views._remember_started_job(request, *[f'job-{i}' for i in range(64)])
+            self.assertEqual(session['started_jobs'], [f'job-{i}' for i in range(56, 64)])
+
+
+class BulkAssignTests(BackendTestCase):
+    ASSIGN = '/api/v1/vlans/access_vlan/1/10'
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def post_json(self, assignments):
+        return self.client.post(reverse('junox:bulk_assign_vlan'), json.dumps({'assignments': assignments}),
+                                content_type='application/json')
+
+    def test_json_assignments_are_remembered_for_the_job_panel(self):
+        self.backend.routes[('POST', self.ASSIGN)] = {'job_id': 'job-a'}
+        response = self.post_json([{'device_id': 1, 'interface_name': 'ge-0/0/1', 'vlan_id': 10}])
+        self.assertEqual(response.json()['succeeded'], 1)
+        self.assertEqual(self.client.session['started_jobs'], ['job-a'])
+
+    def test_non_dict_reply_still_counts_as_assigned(self):
+        self.backend.routes[('POST', self.ASSIGN)] = ['queued']
+        response = self.post_json([{'device_id': 1, 'interface_name': 'ge-0/0/1', 'vlan_id': 10}])
+        self.assertEqual(response.json()['results'][0], {
+            'device_id': '1', 'interface_name': 'ge-0/0/1', 'vlan_id': '10', 'success': True, 'job_id': None})
+
+    def test_form_without_device_is_a_bad_request(self):
+        for device_id, hostname in (('', 'sw-001'), ('1', ''), ('x', 'sw-001')):
+            response = self.client.post(reverse('junox:bulk_assign_vlan'), {
+                'device_id': device_id, 'hostname': hostname, 'bulk_vlan_id': '10', 'interfaces': ['ge-0/0/1']})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.backend.count('POST', self.ASSIGN), 0)
+
+    def test_json_ids_must_be_numbers(self):
+        for item in ({'device_id': '1/../../devices/provision', 'interface_name': 'ge-0/0/1', 'vlan_id': 10},
+                     {'device_id': 1, 'interface_name': 'ge-0/0/1', 'vlan_id': '10?x=1'}):
+            self.assertEqual(self.post_json([item]).status_code, 400)
+        self.assertEqual([call for call in self.backend.calls if call[0] == 'POST' and call[1] != '/api/v1/token'], [])
+
+    def test_single_assignment_without_job_id(self):
+        for body in (['queued'], None):
+            self.backend.routes[('POST', self.ASSIGN)] = body
+            response = self.client.post(reverse('junox:assign_vlan'), {
+                'device_id': '1', 'hostname': 'sw-001', 'interface_name': 'ge-0/0/1', 'vlan_ge-0/0/1': '10'},
+                follow=True)
+            self.assertContains(response, 'VLAN 10 assigned to ge-0/0/1 on sw-001')
+        self.assertNotIn('started_jobs', self.client.session)
+
+    def test_single_assignment_with_a_bad_device_is_a_bad_request(self):
+        response = self.client.post(reverse('junox:assign_vlan'), {
+            'device_id': '../1', 'hostname': 'sw-001', 'interface_name': 'ge-0/0/1', 'vlan_id': '10'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiHealthTests(TestCase):
+    def setUp(self):
+        context_processors._health.update(info=None, checked_at=0.0)
+        self.addCleanup(context_processors._health.update, info=None, checked_at=0.0)
+
+    def test_checking_until_the_first_answer(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_health():
+            started.set()
+            release.wait(5)
+            return {'version': '1.2.3', 'status': 'online'}
+
+        with mock.patch.object(context_processors, 'service_get_api_health', side_effect=slow_health) as health:
+            self.assertEqual(context_processors.api_version_info(None)['api_info']['status'], 'checking')
+            started.wait(5)
+            # Still in flight: no second check
+            self.assertEqual(context_processors.api_version_info(None)['api_info']['status'], 'checking')
+            release.set()
+            with context_processors._refreshing:
+                pass
+
+        self.assertEqual(health.call_count, 1)
+        self.assertEqual(context_processors.api_version_info(None)['api_info']['version'], 'v1.2.3')
+
+    def test_only_one_refresh_is_scheduled(self):
+        with mock.patch('threading.Thread') as thread:
+            for _ in range(5):
+                context_processors._schedule_refresh()
+        self.assertEqual(thread.call_count, 1)
+        context_processors._refreshing.release()
+
+
+@override_settings(API_DEVICES_SERVER_PAGING='auto')
+class DevicePagingTests(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = make_token()
+
+    def test_list_backend_is_downloaded_once(self):
+        first = services.get_device_page(self.token, offset=0, limit=15)
+        second = services.get_device_page(self.token, offset=15, limit=15, sort='-hostname')
+
+        self.assertEqual(services._server_paging['supported'], False)
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 1)
+        self.assertEqual((first['total'], len(first['devices'])), (40, 15))
+        self.assertEqual(second['devices'][0]['hostname'], 'sw-025')
+
+    def test_server_paged_backend_gets_the_parameters(self):
+        self.backend.routes[('GET', '/api/v1/devices')] = lambda params, **kwargs: {
+            'items': DEVICES[params['offset']:params['offset'] + params['limit']], 'total': len(DEVICES)}
+
+        page = services.get_device_page(self.token, offset=30, limit=15)
+        self.assertEqual(services._server_paging['supported'], True)
+        self.assertEqual((page['total'], len(page['devices'])), (40, 10))
+
+    def test_object_without_paging_fields_is_paged_locally(self):
+        self.backend.routes[('GET', '/api/v1/devices')] = {'items': DEVICES}
+
+        page = services.get_device_page(self.token, offset=0, limit=15, search='sw-00')
+        self.assertEqual((page['total'], len(page['devices'])), (9, 9))
+
+
+class ApiClientTests(BackendTestCase):
+    def test_sessions_are_pooled_per_thread(self):
+        client = ApiClient()
+        session = client._session(idempotent=True)
+        self.assertIs(client._session(idempotent=True), session)
+        self.assertIsNot(client._session(idempotent=False), session)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(client._session(idempotent=True)))
+        thread.start()
+        thread.join()
+        # Each thread its own session, all of them on the same connection pool
+        self.assertIsNot(other[0], session)
+        self.assertIs(other[0].get_adapter('http://backend/'), session.get_adapter('http://backend/'))
+
+    def test_only_reads_are_retried(self):
+        client = ApiClient()
+        get_retry = client._session(idempotent=True).get_adapter('http://backend/').max_retries
+        write_retry = client._session(idempotent=False).get_adapter('http://backend/').max_retries
+        self.assertTrue(get_retry.is_retry('GET', 503))
+        self.assertFalse(get_retry.is_retry('POST', 503))
+        self.assertEqual(write_retry.total, 0)
+
+    def test_token_goes_in_the_authorization_header(self):
+        api_get('http://127.0.0.1:8000/api/v1/ping', token='abc')
+        self.assertEqual(self.backend.calls[-1][2]['headers']['Authorization'], 'Bearer abc')
+
+
+class ApiClientCookieTests(SimpleTestCase):
+    def test_backend_cookies_are_never_sent_back(self):
+        seen = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                seen.append(self.headers.get('Cookie'))
+                self.send_response(200)
+                self.send_header('Set-Cookie', 'backend_session=alice; Path=/')
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        client = ApiClient()
+        url = f'http://127.0.0.1:{server.server_port}/api/v1/ping'
+        client.get(url)
+        client.get(url)
+        self.assertEqual(seen, [None, None])
+        self.assertEqual(len(client._session(idempotent=True).cookies), 0)
+
+
+class FanOutTests(SimpleTestCase):
+    def test_gather_runs_calls_at_the_same_time(self):
+        # Both calls have to be in flight together to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def call(value):
+            barrier.wait()
+            return value
+
+        self.assertEqual(gather({'a': (call, 1), 'b': (call, 2)}), {'a': 1, 'b': 2})
+
+    def test_gather_gives_failed_and_slow_calls_the_default(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def fail():
+            raise ValueError("backend said no")
+
+        with self.assertLogs('junox.concurrency', 'WARNING'):
+            results = gather({'ok': (lambda: 1,), 'failed': (fail,), 'slow': (release.wait, 5)},
+                             timeout=0.2, default='n/a')
+        self.assertEqual(results, {'ok': 1, 'failed': 'n/a', 'slow': 'n/a'})
+
+    def test_agather(self):
+        async def call(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        async def fail():
+            raise ValueError("backend said no")
+
+        with self.assertLogs('junox.concurrency', 'ERROR'):
+            results = asyncio.run(agather({'a': (call, 1), 'b': (fail,)}))
+        self.assertEqual(results, {'a': 1, 'b': None})
+
+
+class MapBoundedTests(SimpleTestCase):
+    def test_map_bounded_keeps_order_and_limit(self):
+        lock = threading.Lock()
+        running = [0, 0]  # now, most at once
+
+        def call(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            if item == 3:
+                raise ValueError(item)
+            return item * 10
+
+        with self.assertLogs('junox.concurrency', 'ERROR'):
+            results = map_bounded(call, range(8), limit=2)
+        self.assertEqual([r if not isinstance(r, ValueError) else 'error' for r in results],
+                         [0, 10, 20, 'error', 40, 50, 60, 70])
+        self.assertLessEqual(running[1], 2)
+
+
+class DeviceVlanListTests(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend.routes.update({
+            ('GET', '/api/v1/interfaces/1/interfaces_db'): {'interfaces': [
+                {'interface_name': f'ge-0/0/{i}', 'admin_status': 'up', 'oper_status': 'up',
+                 'interface_tagness': 'untagged'} for i in range(48)]},
+            ('GET', '/api/v1/vlans/1/fetch_vlans_db'): [
+                {'vlan_id': v, 'vlan_name': f'vlan-{v:04d}'} for v in range(1, 201)],
+        })
+        self.login()
+
+    def test_options_are_rendered_once_per_page(self):
+        response = self.client.get(reverse('junox:device_detail', args=[1, 'sw-001']))
+        self.assertContains(response, 'ge-0/0/47')
+        self.assertContains(response, '200 - vlan-0200</option>', count=1)
+        self.assertContains(response, 'form="assign-vlan" data-vlan-options', count=48)
+
+    def test_vlan_list_endpoint_revalidates(self):
+        response = self.client.get(reverse('junox:device_vlans', args=[1]))
+        self.assertEqual(len(response.json()['vlans']), 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn(f'max-age={views.DEVICE_VLANS_MAX_AGE}', response['Cache-Control'])
+
+        again = self.client.get(reverse('junox:device_vlans', args=[1]), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_lazy_page_skips_the_vlan_fetch(self):
+        with mock.patch.object(views, 'DEVICE_VLANS_LAZY', True):
+            response = self.client.get(reverse('junox:device_detail', args=[1, 'sw-001']))
+        self.assertContains(response, f'data-src="{reverse("junox:device_vlans", args=[1])}"')
+        self.assertNotContains(response, 'vlan-0001')
+        self.assertEqual(self.backend.count('GET', '/api/v1/vlans/1/fetch_vlans_db'), 0)
+
+
+class TemplateCacheTests(BackendTestCase):
+    def test_templates_are_compiled_once(self):
+        engine = Engine.get_default()
+        self.assertIsInstance(engine.template_loaders[0], CachedLoader)
+        self.assertIs(engine.get_template('junox/jobs_list.html'), engine.get_template('junox/jobs_list.html'))
+
+    def test_fragment_follows_the_data_version(self):
+        self.login()
+        url = reverse('junox:device_detail', args=[1, 'sw-001'])
+        version = self.client.get(url).context['data_version']
+        key = make_template_fragment_key('device_interface_table', [1, 'sw-001', version])
+        self.assertIsNotNone(cache.get(key))
+
+        # Same data: the table comes from the fragment cache
+        cache.set(key, '<p>cached interface table</p>')
+        self.assertContains(self.client.get(url), 'cached interface table')
+
+        # New data, new version: the table is rendered again
+        self.backend.routes[('GET', '/api/v1/interfaces/1/interfaces_db')] = {'interfaces': [
+            {'interface_name': 'xe-0/1/0', 'admin_status': 'up', 'oper_status': 'up', 'interface_tagness': 'tagged'}]}
+        api_cache.invalidate('interfaces')
+        response = self.client.get(url)
+        self.assertNotContains(response, 'cached interface table')
+        self.assertContains(response, 'xe-0/1/0')
+
+
+class DeviceDetailFanOutTests(BackendTestCase):
+    def test_page_renders_when_one_call_fails(self):
+        self.backend.routes[('GET', '/api/v1/vlans/1/fetch_vlans_db')] = requests.exceptions.ConnectTimeout
+        self.login()
+        with self.assertLogs('junox.services', 'WARNING'):
+            response = self.client.get(reverse('junox:device_detail', args=[1, 'sw-001']))
+        self.assertContains(response, 'ge-0/0/3')
+        self.assertEqual(self.backend.count('GET', '/api/v1/interfaces/1/interfaces_db'), 1)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_single_flight_shares_one_call(self):
+        flights = SingleFlight()
+        entered, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            entered.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do('key', fetch)))
+        leader.start()
+        entered.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flights.do('key', fetch, timeout=5)))
+                     for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 5)
+        # Nothing left in flight: the next call runs again
+        flights.do('key', lambda: calls.append(1))
+        self.assertEqual(len(calls), 2)
+
+    def test_single_flight_raises_the_error_to_every_caller(self):
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            SingleFlight().do('key', fail)
+
+
+class TokenRefreshTests(BackendTestCase):
+    def test_concurrent_refreshes_share_one_backend_call(self):
+        new_token = make_token(900)
+
+        def refresh(**kwargs):
+            time.sleep(0.2)
+            return {'access_token': new_token}
+
+        self.backend.routes[('POST', '/api/v1/refresh')] = refresh
+        refresh_token = make_token(3600)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(tokens.refresh_access_token(refresh_token)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # A request arriving right after reuses the cached answer too
+        results.append(tokens.refresh_access_token(refresh_token))
+        self.assertEqual(results, [new_token] * 6)
+        self.assertEqual(self.backend.count('POST', '/api/v1/refresh'), 1)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+class SessionStatusTests(BackendTestCase):
+    def test_rejected_token_ends_the_session(self):
+        self.login()
+        self.backend.routes[('GET', '/api/v1/ping')] = (401, {'detail': 'Not authenticated'})
+        self.assertEqual(self.client.get(reverse('junox:session_status')).status_code, 401)
+
+    def test_ping_waiter_that_gives_up_keeps_the_session(self):
+        self.login()
+        entered, release = threading.Event(), threading.Event()
+
+        def ping(**kwargs):
+            entered.set()
+            release.wait(5)
+            return {'status': 'ok'}
+
+        self.backend.routes[('GET', '/api/v1/ping')] = ping
+        token = self.client.session['auth_token']
+        leader = threading.Thread(target=tokens.backend_accepts, args=[token])
+        leader.start()
+        self.addCleanup(leader.join)
+        self.addCleanup(release.set)
+        entered.wait(5)
+
+        with mock.patch.object(tokens, 'get_budget', return_value=0.05), self.assertLogs('junox.tokens', 'WARNING'):
+            response = self.client.get(reverse('junox:session_status'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['authenticated'])
+        self.assertEqual(self.backend.count('GET', '/api/v1/ping'), 1)
+
+
+class ApiCacheTests(BackendTestCase):
+    URL = 'http://127.0.0.1:8000/api/v1/devices'
+
+    def get(self, token=None, group='devices'):
+        return api_cache.cached_get(group, self.URL, token=token or make_token())
+
+    def later(self, seconds):
+        return mock.patch('junox.api_cache.time.time', return_value=time.time() + seconds)
+
+    def test_served_from_cache_within_the_ttl(self):
+        token = make_token()
+        first, second = self.get(token), self.get(token)
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.data, DEVICES)
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 1)
+
+    def test_groups_without_a_ttl_are_not_cached(self):
+        self.get(group='uncached')
+        self.get(group='uncached')
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 2)
+
+    def test_invalidate_drops_every_users_entries(self):
+        token = make_token()
+        self.get(token)
+        api_cache.invalidate('devices')
+        self.assertFalse(self.get(token).from_cache)
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 2)
+
+    def test_entries_are_per_user(self):
+        self.get(make_token(sub='alice'))
+        self.get(make_token(sub='alice', expires_in=900))  # a refreshed token, same user
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 1)
+        self.get(make_token(sub='bob'))
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 2)
+
+    def test_expired_entry_is_revalidated_with_its_etag(self):
+        token = make_token()
+        first = self.get(token)
+        with self.later(31):
+            second = self.get(token)
+
+        self.assertIn('If-None-Match', self.backend.calls[-1][2]['headers'])
+        self.assertTrue(second.from_cache)
+        self.assertEqual((second.data, second.version), (first.data, first.version))
+
+    def test_expired_entry_is_served_stale_while_the_backend_is_down(self):
+        token = make_token()
+        self.get(token)
+        self.backend.routes[('GET', '/api/v1/devices')] = requests.exceptions.ConnectionError
+        with self.later(31):
+            stale = self.get(token)
+        self.assertTrue(stale.stale)
+        self.assertEqual(stale.data, DEVICES)
+
+        api_cache.invalidate('devices')
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.get(token)
+
+    def slow_backend(self, seconds):
+        def devices(**kwargs):
+            time.sleep(seconds)
+            return DEVICES
+        self.backend.routes[('GET', '/api/v1/devices')] = devices
+
+    def concurrently(self, *calls):
+        # Each call's result or exception, started 50ms apart so the first one leads
+        results = [None] * len(calls)
+
+        def run(index, call):
+            try:
+                results[index] = call()
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=run, args=item) for item in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_waiting_budget_covers_the_retries(self):
+        # 3 attempts at 2s connect + 10s read, plus 0.2s and 0.4s of backoff
+        self.assertAlmostEqual(api_client.get_budget(), 36.6)
+        self.assertAlmostEqual(api_client.get_budget(5), 3 * (2 + 5) + 0.6)
+
+    def test_waiter_that_gives_up_gets_a_requests_timeout(self):
+        token = make_token()
+        self.slow_backend(0.4)
+        with mock.patch('junox.api_cache.get_budget', return_value=0.1):
+            leader, waiter = self.concurrently(lambda: self.get(token), lambda: self.get(token))
+        self.assertEqual(leader.data, DEVICES)
+        self.assertIsInstance(waiter, requests.exceptions.RequestException)
+
+    def test_waiter_that_gives_up_is_served_the_stale_entry(self):
+        token = make_token()
+        self.get(token)
+        self.slow_backend(0.4)
+        with self.later(31), mock.patch('junox.api_cache.get_budget', return_value=0.1):
+            leader, waiter = self.concurrently(lambda: self.get(token), lambda: self.get(token))
+        self.assertTrue(waiter.stale)
+        self.assertEqual(waiter.data, DEVICES)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')  # The test database is per thread
+    def test_pages_degrade_instead_of_failing_while_waiting(self):
+        self.slow_backend(0.4)
+        self.login()
+        with mock.patch('junox.api_cache.get_budget', return_value=0.1), self.assertLogs('junox.services', 'WARNING'):
+            responses = self.concurrently(lambda: self.client.get(reverse('junox:device_dashboard')),
+                                          lambda: self.client.get(reverse('junox:device_dashboard')))
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertContains(responses[0], 'sw-001')
+        self.assertNotContains(responses[1], 'sw-001')
+
+
+class SearchIndexTests(SimpleTestCase):
+    FIELDS = services.DEVICE_SEARCH_FIELDS
+
+    def setUp(self):
+        search._indexes.clear()
+        self.addCleanup(search._indexes.clear)
+
+    def test_matches_keep_inventory_order(self):
+        index = search.DeviceSearchIndex(DEVICES, self.FIELDS)
+        self.assertEqual([d['id'] for d in index.search('SW-01')], list(range(10, 20)))
+        self.assertEqual([d['id'] for d in index.search('sn0003')], list(range(30, 40)))
+        # Short queries are a plain scan, with the same answers
+        self.assertEqual([d['id'] for d in index.search('40')], [40])
+        self.assertEqual(index.search('no-such-switch'), [])
+
+    def test_a_match_never_spans_two_fields(self):
+        index = search.DeviceSearchIndex([{'hostname': 'core', 'ip_address': '10.0.0.1'}], ('hostname', 'ip_address'))
+        self.assertEqual(index.search('re10'), [])
+        self.assertEqual(len(index.search('ore')), 1)
+
+    def test_one_index_per_version_least_recently_used_evicted(self):
+        first = search.get_device_index('v1', DEVICES, self.FIELDS)
+        self.assertIs(search.get_device_index('v1', [], self.FIELDS), first)
+
+        for version in ('v2', 'v3', 'v4'):
+            search.get_device_index(version, DEVICES, self.FIELDS)
+        search.get_device_index('v1', DEVICES, self.FIELDS)  # used again: now the most recent
+        search.get_device_index('v5', DEVICES, self.FIELDS)
+
+        self.assertEqual([key[1] for key in search._indexes], ['v3', 'v4', 'v1', 'v5'])
+
+    def test_device_page_search_uses_the_index(self):
+        page = services._page_devices_locally(DEVICES, 'v1', 'sw-00', 0, 5, '-hostname')
+        self.assertEqual(page['total'], 9)
+        self.assertEqual([d['hostname'] for d in page['devices']], ['sw-009', 'sw-008', 'sw-007', 'sw-006', 'sw-005'])
+
+
+class PaginationTests(SimpleTestCase):
+    def request(self, query=''):
+        return RequestFactory().get('/junox/device_dashboard/?' + query)
+
+    def test_window_around_the_current_page(self):
+        page = PageWindow(self.request('q=sw&page=4'), 15, number=4, total=100)
+        self.assertEqual((page.last_page, page.offset), (7, 45))
+        self.assertEqual([link.get('number') for link in page.links], [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(page.next_url, '?q=sw&page=5')
+
+        page = PageWindow(self.request(), 15, number=1, total=1000)
+        self.assertEqual([link.get('number') for link in page.links], [1, 2, 3, None, 67])
+        self.assertIsNone(page.prev_url)
+
+    def test_number_is_clamped_to_the_results(self):
+        self.assertEqual(PageWindow(self.request(), 15, number=99, total=100).number, 7)
+        self.assertEqual(PageWindow(self.request(), 15, number=3, total=0).number, 1)
+        self.assertEqual(page_number(self.request('page=abc')), 1)
+        self.assertEqual(page_number(self.request('page=-2')), 1)
+
+    def test_cursor_mode(self):
+        page = PageWindow.cursor(self.request('q=sw&cursor=c1'), 15, next_cursor='c2', prev_cursor='c0')
+        self.assertTrue(page.is_cursor)
+        self.assertEqual((page.next_url, page.prev_url), ('?q=sw&cursor=c2', '?q=sw&cursor=c0'))
+        self.assertEqual(page.links, [])
+        self.assertFalse(PageWindow.cursor(self.request(), 15).has_other_pages)
+
+
+class CursorPagingTests(BackendTestCase):
+    def test_inventory_follows_the_backends_cursors(self):
+        def devices(params, **kwargs):
+            start = int(params.get('cursor', 0))
+            return {'items': DEVICES[start:start + params['limit']], 'next_cursor': str(start + params['limit'])}
+
+        self.backend.routes[('GET', '/api/v1/devices')] = devices
+        self.login()
+        response = self.client.get(reverse('junox:device_dashboard'), {'cursor': '15'})
+        self.assertContains(response, 'sw-016')
+        self.assertContains(response, 'cursor=30')
+        self.assertEqual(self.backend.calls[-1][2]['params']['cursor'], '15')
+
+
+class AsyncViewTests(BackendTestCase):
+    """The ASGI pages, called directly with AsyncApiClient on the FakeBackend."""
+
+    def request(self, path='/', method='get', data=None, token=True):
+        request = getattr(AsyncRequestFactory(), method)(path, data or {})
+        request.session = SessionStore()
+        if token:
+            request.session['auth_token'] = make_token()
+        return request
+
+    async def test_pages_render_off_the_event_loop(self):
+        on_loop = []
+
+        def render(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return real_render(*args, **kwargs)
+
+        real_render = views.render
+        with mock.patch.object(views, 'render', side_effect=render):
+            dashboard = await async_views.dashboard_view(self.request())
+            devices = await async_views.device_dashboard_view(self.request(data={'q': 'sw-01'}))
+            detail = await async_views.device_detail_view(self.request(), 1, 'sw-001')
+
+        self.assertEqual([dashboard.status_code, devices.status_code, detail.status_code], [200, 200, 200])
+        self.assertEqual(on_loop, [False, False, False])
+        self.assertContains(devices, 'sw-010')
+        self.assertNotContains(devices, 'sw-020')
+        self.assertContains(detail, 'ge-0/0/3')
+
+    async def test_backend_down_still_renders(self):
+        self.backend.routes[('GET', '/api/v1/devices')] = requests.exceptions.ConnectionError
+        self.backend.routes[('GET', '/api/v1/devices/inventory/stats')] = (500, {'detail': 'boom'})
+
+        with self.assertLogs('junox', 'WARNING'):
+            dashboard = await async_views.dashboard_view(self.request())
+            devices = await async_views.device_dashboard_view(self.request())
+
+        self.assertEqual([dashboard.status_code, devices.status_code], [200, 200])
+        self.assertNotContains(devices, 'sw-001')
+
+    async def test_without_a_token_redirects_to_login(self):
+        response = await async_views.dashboard_view(self.request(token=False))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('junox:login_junox'))
+
+    async def test_bad_stream_requests_are_refused(self):
+        self.assertEqual((await async_views.jobs_stream_view(self.request())).status_code, 400)
+        wsgi_request = RequestFactory().get('/', {'ids': 'job-001'})
+        wsgi_request.session = self.request().session
+        self.assertEqual((await async_views.jobs_stream_view(wsgi_request)).status_code, 400)
+        response = await async_views.device_log_stream_view(self.request(), 'not-mine')
+        self.assertEqual(response.status_code, 403)
+
+    async def test_bulk_import_without_input_is_refused(self):
+        response = await async_views.bulk_add_device_view(self.request(method='post', data={'rows': ' '}))
+        self.assertEqual(response.status_code, 400)
+
+
+class JobStreamTests(BackendTestCase):
+    @override_settings(JOB_STREAM_POLL_SECONDS=0.3, API_CACHE_TTLS={'jobs': 10, 'job_changes': 0.2})
+    async def test_status_change_shows_on_the_next_tick(self):
+        job = dict(JOBS[0], status='running', ended_at=None)
+        self.backend.routes[('GET', '/api/v1/other/jobs/all')] = lambda **kwargs: [job]
+
+        frames = job_stream.stream_job_updates(make_token(), ['job-001'])
+        self.assertEqual(await anext(frames), sse.comment('connected'))
+        self.assertIn(b'"status": "running"', await anext(frames))
+
+        job.update(status='completed', ended_at='2026-01-01T11:01:00')
+        self.assertIn(b'"status": "completed"', await asyncio.wait_for(anext(frames), 1))
+        self.assertEqual(await anext(frames), sse.event(['closed'], event='end'))
+
+
+@override_settings(API_JOBS_SERVER_PAGING='auto')
+class JobsPagingTests(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = make_token()
+
+    def test_list_backend_is_detected_and_downloaded_once(self):
+        first = services.service_get_jobs_page(self.token, sort='created_at', order='desc', limit=5)
+        second = services.service_get_jobs_page(self.token, search='10.0.0.1', sort='id', order='asc')
+
+        self.assertEqual(services._jobs_server_paging['supported'], False)
+        self.assertEqual(self.backend.count('GET', '/api/v1/other/jobs/all'), 1)
+        self.assertEqual([job['id'] for job in first['jobs']], [f'job-{i:03d}' for i in range(30, 25, -1)])
+        # 10.0.0.1 and 10.0.0.10-19
+        self.assertEqual(second['total'], 11)
+        self.assertEqual(second['jobs'][0]['id'], 'job-001')
+
+    def test_sorting_tolerates_missing_and_mixed_values(self):
+        jobs = [dict(JOBS[0], ended_at=None), dict(JOBS[1], ended_at='not a date'), JOBS[2]]
+        self.backend.routes[('GET', '/api/v1/other/jobs/all')] = jobs
+        page = services.service_get_jobs_page(self.token, sort='ended_at', order='desc')
+        # Text sorts above timestamps, missing values go last either way
+        self.assertEqual([job['id'] for job in page['jobs']], ['job-002', 'job-003', 'job-001'])
+        page = services.service_get_jobs_page(self.token, sort='ended_at', order='asc')
+        self.assertEqual([job['id'] for job in page['jobs']], ['job-003', 'job-002', 'job-001'])
+
+    def test_paged_backend_gets_the_parameters(self):
+        self.backend.routes[('GET', '/api/v1/other/jobs/all')] = lambda params, **kwargs: {
+            'items': JOBS[params['offset']:params['offset'] + params['limit']], 'total': len(JOBS)}
+        page = services.service_get_jobs_page(self.token, offset=15, limit=15)
+
+        self.assertEqual(services._jobs_server_paging['supported'], True)
+        self.assertEqual((page['total'], page['jobs'][0]['id']), (30, 'job-016'))
+        self.assertEqual(self.backend.calls[-1][2]['params']['order'], 'desc')
+
+
+class PageEtagTests(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse('junox:vlan_catalog')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # New backend data, new page
+        self.backend.routes[('GET', '/api/v1/vlans/get_vlan_catalog_db')] = [
+            {'vlan_id': 99, 'name': 'v99', 'category': 'Data'}]
+        api_cache.invalidate('vlan_catalog')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_query_string_is_part_of_the_etag(self):
+        url = reverse('junox:device_dashboard')
+        first = self.client.get(url)
+        second = self.client.get(url, {'page': 2}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+
+@skipIf(websockets is None, "needs the optional websockets package")
+class LogRelayTests(SimpleTestCase):
+    """device_log_stream_view against a local WebSocket server standing in for FastAPI's /ws/logs."""
+
+    @contextlib.asynccontextmanager
+    async def serve(self, lines):
+        connections = []
+
+        async def handler(connection):
+            connections.append((connection.request.path, connection.request.headers.get('Authorization')))
+            for line in lines:
+                await connection.send(line)
+
+        async with websockets.asyncio.server.serve(handler, '127.0.0.1', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            with override_settings(API_WS_ROOT=f'ws://127.0.0.1:{port}'):
+                yield connections
+
+    def request(self, token, log_sessions):
+        request = AsyncRequestFactory().get('/')
+        request.session = SessionStore()
+        request.session.update({'auth_token': token, 'log_sessions': log_sessions})
+        return request
+
+    async def read(self, response):
+        return [frame.decode() async for frame in response.streaming_content]
+
+    async def test_relays_only_sessions_issued_to_the_caller(self):
+        token = make_token()
+        async with self.serve(['line 1', 'line 2']) as connections:
+            response = await async_views.device_log_stream_view(self.request(token, ['mine']), 'not-mine')
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(connections, [])
+
+            response = await async_views.device_log_stream_view(self.request(token, ['mine']), 'mine')
+            frames = await self.read(response)
+        self.assertEqual(connections, [('/ws/logs/mine', f'Bearer {token}')])
+        self.assertIn('data: line 1\ndata: line 2', ''.join(frames))
+        self.assertEqual(frames[-1], 'event: end\ndata: closed\n\n')
+
+    @override_settings(LOG_RELAY_BATCH_LINES=50, LOG_RELAY_BATCH_WINDOW=0.5)
+    async def test_lines_are_batched_into_frames(self):
+        async with self.serve([f'line {i}' for i in range(120)]):
+            response = await async_views.device_log_stream_view(self.request(make_token(), ['s1']), 's1')
+            frames = await self.read(response)
+        sizes = [frame.count('data: line ') for frame in frames if 'data: line ' in frame]
+        self.assertEqual(sum(sizes), 120)
+        self.assertLessEqual(max(sizes), 50)
+        self.assertLess(len(sizes), 120)
+
+    async def test_slow_reader_pauses_the_upstream(self):
+        lines = [f'line {i}' for i in range(100)]
+        async with self.serve(lines):
+            queue = asyncio.Queue(maxsize=5)
+            reader = asyncio.create_task(log_relay._read_upstream('s1', make_token(), queue))
+            await asyncio.sleep(0.2)
+            # Full and waiting, not growing and not dropping
+            self.assertEqual(queue.qsize(), 5)
+            self.assertFalse(reader.done())
+
+            received = []
+            while not isinstance(item := await queue.get(), log_relay._Closed):
+                received.append(item)
+            await reader
+        self.assertEqual(received, lines)
+        self.assertIsNone(item.error)
+
+
+class MetricsTests(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def test_server_timing_splits_backend_render_and_cache(self):
+        timing = self.client.get(reverse('junox:device_dashboard'))['Server-Timing']
+        self.assertRegex(timing, r'^view;dur=[\d.]+, render;dur=[\d.]+, ')
+        self.assertIn('desc="GET /devices x1"', timing)
+        self.assertIn('cache;desc="miss=1"', timing)
+
+        timing = self.client.get(reverse('junox:device_dashboard'))['Server-Timing']
+        self.assertNotIn('api;', timing)
+        self.assertIn('cache;desc="hit=1"', timing)
+
+    def test_metrics_endpoint_needs_its_token(self):
+        self.client.get(reverse('junox:device_dashboard'))
+        url = reverse('junox:metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        with override_settings(METRICS_TOKEN='scrape-me'):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-me')
+
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('junox_request_duration_seconds_count{view="junox:device_dashboard",method="GET",status="200"}',
+                      body)
+        self.assertIn('junox_backend_request_duration_seconds_count{endpoint="GET /devices",status="200"}',
+                      body)
+        self.assertIn('junox_cache_requests_total{group="devices",result="miss"}', body)
+
+
+class BulkImportTests(BackendTestCase):
+    def test_rows_are_validated(self):
+        text = ('hostname,username,password\n'
+                '# lab switches\n'
+                'sw-001\n'
+                '\n'
+                'sw-002,ops,secret\n'
+                'bad host!\n'
+                'sw-003,ops,secret,extra\n'
+                'SW-001\n')
+        rows = bulk_import.parse_rows(bulk_import.input_lines(text=text), 'admin', 'pw')
+        self.assertEqual([(row.line, row.hostname, row.username, row.error) for row in rows], [
+            (3, 'sw-001', 'admin', None),
+            (5, 'sw-002', 'ops', None),
+            (6, 'bad host!', 'admin', 'Invalid hostname or IP address'),
+            (7, 'sw-003', 'ops', 'Expected hostname[,username,password]'),
+            (8, 'SW-001', 'admin', 'Duplicate of line 3'),
+        ])
+
+        rows = bulk_import.parse_rows(bulk_import.input_lines(text='sw-001\n'))
+        self.assertEqual([row.error for row in rows], ['Missing username or password'])
+
+    @override_settings(BULK_PROVISION_RATE=0, BULK_PROVISION_MAX_ROWS=3)
+    async def test_rows_stream_as_events_and_stop_at_the_limit(self):
+        self.backend.routes.update({
+            ('POST', '/api/v1/devices/provision/sw-001'): {'job_id': 'job-a'},
+            ('POST', '/api/v1/devices/provision/sw-002'): (500, {'detail': 'device unreachable'}),
+        })
+        request = AsyncRequestFactory().post('/', {'rows': 'sw-001\nsw-002\nbad host!\nsw-004\n',
+                                                   'username': 'admin', 'password': 'pw'})
+        request.session = SessionStore()
+        request.session['auth_token'] = make_token()
+
+        response = await async_views.bulk_add_device_view(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = [frame.decode() async for frame in response.streaming_content]
+
+        self.assertEqual(frames[0], ': connected\n\n')
+        rows = {}
+        for frame in frames[1:-1]:
+            self.assertTrue(frame.startswith('event: row\ndata: '), frame)
+            row = json.loads(frame.split('data: ', 1)[1])
+            rows[row['hostname']] = (row['status'], row['job_id'], row['error'])
+        self.assertEqual(rows, {
+            'sw-001': ('submitted', 'job-a', None),
+            'sw-002': ('failed', None, 'device unreachable'),
+            'bad host!': ('invalid', None, 'Invalid hostname or IP address'),
+        })
+        self.assertTrue(frames[-1].startswith('event: end\n'))
+        self.assertEqual(json.loads(frames[-1].split('data: ', 1)[1]),
+                         {'submitted': 1, 'failed': 1, 'invalid': 1, 'truncated': True})
+        self.assertEqual(self.backend.count('POST', '/api/v1/devices/provision/sw-004'), 0)
+
+
+@override_settings(BREAKER_FAILURES=2, BREAKER_RESET_SECONDS=30)
+class BreakerTests(BackendTestCase):
+    def later(self, seconds):
+        return mock.patch('junox.breaker.time.monotonic', return_value=time.monotonic() + seconds)
+
+    def test_opens_after_failures_then_probes_once(self):
+        circuit = breaker.CircuitBreaker('devices')
+        circuit.before_call()
+        circuit.record(False)
+        circuit.record(ok=True)  # a success in between resets the count
+        circuit.record(False)
+        self.assertEqual(circuit.state, breaker.CLOSED)
+        with self.assertLogs('junox.breaker', 'WARNING') as logs:
+            circuit.record(False)
+        self.assertEqual(circuit.state, breaker.OPEN)
+        self.assertIn('opening', logs.output[0])
+        with self.assertRaises(breaker.BackendUnavailable):
+            circuit.before_call()
+
+        with self.later(31):
+            circuit.before_call()  # the probe
+            self.assertEqual(circuit.state, breaker.HALF_OPEN)
+            with self.assertRaises(breaker.BackendUnavailable):
+                circuit.before_call()  # everyone else, while it's out
+            with self.assertLogs('junox.breaker', 'WARNING'):
+                circuit.record(False)
+        self.assertEqual(circuit.state, breaker.OPEN)
+
+        with self.later(62), self.assertLogs('junox.breaker', 'WARNING') as logs:
+            circuit.before_call()
+            circuit.record(True)
+        self.assertEqual(circuit.state, breaker.CLOSED)
+        self.assertIn('closing', logs.output[0])
+
+    def test_open_group_serves_stale_pages_without_calling_the_backend(self):
+        token = make_token()
+        services.get_device_page(token)
+        self.backend.routes[('GET', '/api/v1/devices')] = (503, {'detail': 'down'})
+
+        with mock.patch('junox.api_cache.time.time', return_value=time.time() + 31), \
+                self.assertLogs('junox.breaker', 'WARNING'):
+            for _ in range(2):
+                self.assertEqual(services.get_device_page(token)['total'], len(DEVICES))
+            calls = self.backend.count('GET', '/api/v1/devices')
+            page = services.get_device_page(token)
+
+        self.assertEqual(breaker.open_groups(), ['devices'])
+        self.assertEqual(page['total'], len(DEVICES))
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), calls)
+
+    def test_client_errors_keep_the_breaker_closed(self):
+        self.backend.routes[('GET', '/api/v1/devices')] = (404, {'detail': 'Not Found'})
+        for _ in range(3):
+            services.get_device_page(make_token())
+        self.assertEqual(breaker.open_groups(), [])
+
+    def test_failing_provisioning_leaves_the_inventory_reachable(self):
+        self.backend.routes[('POST', '/api/v1/devices/provision/sw-041')] = (500, {'detail': 'device unreachable'})
+        token = make_token()
+        with self.assertLogs('junox.breaker', 'WARNING'):
+            for _ in range(2):
+                self.assertFalse(services.service_add_device(token, 'sw-041', 'admin', 'pw', None)['success'])
+
+        self.assertEqual(breaker.open_groups(), ['devices (writes)'])
+        self.assertEqual(services.get_device_page(token)['total'], len(DEVICES))
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 1)
+
+    def test_auth_reads_and_writes_share_a_group(self):
+        self.assertEqual(breaker.group_for(f'{services.API_URL}/token', 'POST'), 'auth')
+        self.assertEqual(breaker.group_for(f'{services.API_URL}/ping'), 'auth')
+        self.assertEqual(breaker.group_for(f'{services.API_URL}/vlans/access_vlan/1/10', 'POST'), 'vlans (writes)')
+
+
+class SessionWriteTests(BackendTestCase):
+    def test_same_token_leaves_the_session_unmodified(self):
+        session = SessionStore()
+        token = make_token()
+        store_auth_token(session, token)
+        self.assertTrue(session.modified)
+
+        session.modified = False
+        store_auth_token(session, token)
+        self.assertFalse(session.modified)
+        store_auth_token(session, make_token(expires_in=900))
+        self.assertTrue(session.modified)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_pages_only_save_the_session_when_the_token_is_refreshed(self):
+        self.backend.routes[('POST', '/api/v1/token')] = {
+            'access_token': make_token(expires_in=60), 'refresh_token': make_token(3600)}
+        self.login()
+        old_token = self.client.session['auth_token']
+
+        with mock.patch('django.contrib.sessions.backends.db.SessionStore.save', autospec=True,
+                        side_effect=DbSessionStore.save) as save:
+            self.client.get(reverse('junox:dashboard'))  # expires within the refresh window
+            self.client.get(reverse('junox:dashboard'))
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(self.backend.count('POST', '/api/v1/refresh'), 1)
+        self.assertNotEqual(self.client.session['auth_token'], old_token)
+
+
+class StaticAssetsTests(SimpleTestCase):
+    CSS = 'body { color: #111; }\n' + ''.join(f'.col-{i} {{ width: {i}%; }}\n' for i in range(100))
+
+    def setUp(self):
+        source, self.root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(self.root.cleanup)
+        os.makedirs(os.path.join(source.name, 'junox'))
+        for name, text in (('app.css', self.CSS), ('tiny.js', 'let x = 1;\n')):
+            with open(os.path.join(source.name, 'junox', name), 'w') as f:
+                f.write(text)
+
+        settings = override_settings(
+            STATIC_ROOT=self.root.name, STATICFILES_DIRS=[source.name],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={'staticfiles': {'BACKEND': 'junox.static_assets.CompressedManifestStaticFilesStorage'}})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        static_assets._hashed_names.cache_clear()
+        self.addCleanup(static_assets._hashed_names.cache_clear)
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = static_assets.staticfiles_storage.hashed_files
+
+    def path(self, name):
+        return os.path.join(self.root.name, name)
+
+    def serve(self, name, **headers):
+        return static_assets.serve(RequestFactory().get('/', **headers), name)
+
+    def test_collectstatic_writes_hashed_names_and_gzip_copies(self):
+        css = self.hashed['junox/app.css']
+        self.assertRegex(css, r'^junox/app\.[0-9a-f]{12}\.css$')
+        with gzip.open(self.path(css) + '.gz', 'rt') as f:
+            self.assertEqual(f.read(), self.CSS)
+        # Too small to be worth it
+        self.assertFalse(os.path.exists(self.path(self.hashed['junox/tiny.js']) + '.gz'))
+
+    def test_hashed_names_are_served_compressed_and_immutable(self):
+        css = self.hashed['junox/app.css']
+        response = self.serve(css, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], static_assets.IMMUTABLE)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)).decode(), self.CSS)
+
+        self.assertFalse(self.serve(css).has_header('Content-Encoding'))
+        plain = self.serve('junox/app.css')
+        self.assertEqual(plain['Cache-Control'], 'no-cache')
+        self.assertEqual(self.serve('junox/app.css', HTTP_IF_MODIFIED_SINCE=plain['Last-Modified']).status_code, 304)
+
+    def test_paths_outside_static_root_are_not_found(self):
+        for name in ('../settings.py', 'junox/missing.css', '/etc/passwd'):
+            with self.assertRaises(Http404):
+                self.serve(name)
+
+
+@override_settings(JUNOX_HTML_MINIFY=True, JUNOX_COMPRESS=True, COMPRESS_MIN_BYTES=1024)
+class CompressionTests(SimpleTestCase):
+    PAGE = '<ul>\n' + '    <li class="px-4 py-2 text-slate-400">row</li>\n' * 200 + '</ul>\n'
+
+    def middleware(self, response):
+        return compression.CompressionMiddleware(lambda request: response)
+
+    def request(self, encoding='gzip, br'):
+        return RequestFactory().get('/', HTTP_ACCEPT_ENCODING=encoding)
+
+    def test_minify_keeps_preformatted_blocks(self):
+        html = '<div>\n    <p>a</p>\n\n    <pre>  keep\n    this </pre>\n<script>\n  let a = 1;\n</script>\n</div>'
+        self.assertEqual(compression.minify_html(html),
+                         '<div>\n<p>a</p>\n<pre>  keep\n    this </pre>\n<script>\n  let a = 1;\n</script>\n</div>')
+
+    @override_settings(JUNOX_HTML_MINIFY=False, JUNOX_COMPRESS=False)
+    def test_not_loaded_when_both_are_off(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.middleware(HttpResponse())
+
+    def test_gzips_large_html(self):
+        page = HttpResponse(self.PAGE)
+        page['ETag'] = '"abc"'
+        response = self.middleware(page)(self.request('gzip'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content).decode(), compression.minify_html(self.PAGE))
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    def test_leaves_small_uncompressible_and_streamed_responses_alone(self):
+        small = self.middleware(HttpResponse('<p>hi</p>'))(self.request())
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+        identity = self.middleware(HttpResponse(self.PAGE))(self.request(''))
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', identity['Vary'])
+
+        image = self.middleware(HttpResponse(b'\x89PNG' * 1000, content_type='image/png'))(self.request())
+        self.assertFalse(image.has_header('Content-Encoding'))
+
+        events = StreamingHttpResponse(iter([b'data: 1\n\n']), content_type='text/event-stream')
+        self.assertFalse(self.middleware(events)(self.request()).has_header('Content-Encoding'))
+
+    def test_pages_with_a_csrf_token_are_never_brotli(self):
+        with mock.patch.object(compression, 'brotli', object()):
+            request = self.request()
+            self.assertEqual(compression.accepted_encoding(request), 'br')
+            get_token(request)
+            self.assertEqual(compression.accepted_encoding(request), 'gzip')
+
+
+@override_settings(JUNOX_SERVICE_USERNAME='junox-warmer', JUNOX_SERVICE_PASSWORD='x',
+                   API_CACHE_SHARED_GROUPS=('devices', 'stats', 'vlan_catalog'))
+class WarmCacheTests(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        cache_warmer._service_token.update(access=None, refresh=None)
+        self.addCleanup(cache_warmer._service_token.update, access=None, refresh=None)
+
+    def warm_cache(self):
+        out = StringIO()
+        call_command('warm_cache', stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_warmed_entries_are_shared_with_every_user(self):
+        output = self.warm_cache()
+        self.assertRegex(output, r'stats\s+ok')
+        self.assertRegex(output, r'vlan_catalog\s+ok')
+        self.assertEqual(self.backend.count('POST', '/api/v1/token'), 1)
+        calls = len(self.backend.calls)
+
+        for user in ('alice', 'bob'):
+            token = make_token(sub=user)
+            self.assertEqual(services.get_device_page(token, offset=0, limit=15)['total'], len(DEVICES))
+            self.assertTrue(services.service_get_vlan_catalog(token)['success'])
+        self.assertEqual(len(self.backend.calls), calls)
+
+    def test_unreachable_dataset_fails_the_command(self):
+        self.backend.routes[('GET', '/api/v1/vlans/get_vlan_catalog_db')] = requests.exceptions.ConnectionError
+        with self.assertLogs('junox.cache_warmer', 'WARNING'):
+            with self.assertRaisesMessage(CommandError, 'could not be warmed'):
+                self.warm_cache()
+
+    @override_settings(JUNOX_SERVICE_USERNAME=None)
+    def test_command_needs_a_service_account(self):
+        with self.assertRaisesMessage(CommandError, 'JUNOX_SERVICE_USERNAME'):
+            self.warm_cache()
+        self.assertEqual(self.backend.calls, [])
+
+    @override_settings(API_CACHE_SHARED_GROUPS=('devices',), JUNOX_SERVICE_USERNAME=None)
+    def test_shared_groups_need_a_service_account(self):
+        url = f'{services.API_URL}/devices'
+        for user in ('alice', 'bob'):
+            api_cache.cached_get('devices', url, token=make_token(sub=user))
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 2)
+
+        with self.settings(JUNOX_SERVICE_USERNAME='junox-warmer'):
+            for user in ('alice', 'bob'):
+                api_cache.cached_get('devices', url, token=make_token(sub=user))
+        self.assertEqual(self.backend.count('GET', '/api/v1/devices'), 3)
@@ -0,0 +1,147 @@
+# junox/tokens.py
+"""
+Access token refresh shared by every request of a session.
+
+A page load plus its XHRs can all notice an expiring token at the same time.
+Refreshes are de-duplicated per refresh token: one POST /refresh runs per
+process, concurrent requests wait for it, and the new access token is cached
+briefly so requests arriving right after (or in another worker sharing the
+cache) reuse it instead of refreshing again.
+
+Backend validation of a token (/ping, for the session-status poll) is
+de-duplicated and cached the same way.
+"""
+import hashlib
+import logging
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .api_client import get_budget
+from .concurrency import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_refreshes = SingleFlight()
+_pings = SingleFlight()
+
+# Cached when FastAPI refuses the refresh token, so a burst doesn't retry it
+_REFUSED = ''
+
+
+def _cache_key(refresh_token):
+    digest = hashlib.sha256(refresh_token.encode()).hexdigest()
+    return f'junox:token_refresh:{digest}'
+
+
+def _refresh(key, refresh_token):
+    # Someone may have finished the same refresh just before we got the slot
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Imported here: services depends on this module through the response cache
+    from .services import service_refresh_token
+
+    try:
+        new_token = service_refresh_token(refresh_token)
+    except Exception:
+        metrics.count_token_refresh('error')
+        raise
+    metrics.count_token_refresh('refreshed' if new_token else 'refused')
+    cache.set(key, new_token or _REFUSED, getattr(settings, 'TOKEN_REFRESH_CACHE_SECONDS', 30))
+    return new_token
+
+
+def refresh_access_token(refresh_token):
+    """
+    Returns a fresh access token for `refresh_token`, or None if the backend
+    refused it. Raises requests exceptions if the backend is unreachable.
+    """
+    key = _cache_key(refresh_token)
+
+    cached = cache.get(key)
+    if cached is None:
+        # Waiters give up a little after the leader's own request would have
+        cached = _refreshes.do(key, _refresh, key, refresh_token,
+                               timeout=getattr(settings, 'API_REFRESH_TIMEOUT', 3) + 1)
+    else:
+        # Someone refreshed it moments ago
+        metrics.count_token_refresh('reused')
+    return cached or None
+
+
+def _ping(key, token):
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    from .services import service_ping
+
+    status = service_ping(token)
+    if status is None:
+        # Backend unreachable: don't cache, and don't claim either way
+        return None
+    accepted = status not in (401, 403)
+    cache.set(key, accepted, getattr(settings, 'SESSION_PING_CACHE_SECONDS', 60))
+    return accepted
+
+
+def backend_accepts(token):
+    """
+    True if FastAPI accepts `token`, False if it rejects it, None if it
+    couldn't be asked. Answers are cached for SESSION_PING_CACHE_SECONDS.
+    """
+    key = f"junox:session_ping:{hashlib.sha256(token.encode()).hexdigest()}"
+
+    cached = cache.get(key)
+    if cached is None:
+        # The leader's GET is retried, so waiters allow for its whole budget;
+        # if even that runs out, the answer is "unknown" like an unreachable backend
+        try:
+            cached = _pings.do(key, _ping, key, token,
+                               timeout=get_budget(getattr(settings, 'SESSION_PING_TIMEOUT', 2)))
+        except TimeoutError:
+            logger.warning("Gave up waiting for the in-flight session ping")
+            return None
+    return cached
+
+
+def _claims(token):
+    # Unverified: FastAPI checks the signature, we only read claims it issued
+    try:
+        return jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return {}
+
+
+def token_expiry(token):
+    """
+    Reads the 'exp' claim (epoch seconds) of a JWT without verifying it.
+    Returns None if the token has no readable expiry.
+    """
+    exp = _claims(token).get('exp')
+    return exp if isinstance(exp, (int, float)) else None
+
+
+def token_subject(token):
+    """
+    Reads the 'sub' claim (the username) of a JWT, or None.
+    Stays the same across refreshes, unlike the token itself.
+    """
+    sub = _claims(token).get('sub')
+    return str(sub) if sub is not None else None
+
+
+def store_auth_token(session, token):
+    """
+    Saves an access token in the session together with its decoded expiry,
+    so the middleware can check it without decoding the JWT again.
+    Leaves the session unmodified (and so unsaved) if it already has them.
+    """
+    exp = token_expiry(token) or False
+    if session.get('auth_token') != token or session.get('auth_token_exp') != exp:
+        session['auth_token'] = token
+        session['auth_token_exp'] = exp
@@ -1,6 +1,13 @@
+from django.conf import settings
 from django.urls import path
 from django.views.generic import RedirectView
-from . import views
+from . import async_views, views
+
+# Read-heavy pages come from async_views on ASGI deployments
+if getattr(settings, 'JUNOX_ASYNC_VIEWS', False):
+    from . import async_views as read_views
+else:
+    read_views = views
 
 app_name = 'junox'
 
@@ -8,13 +15,21 @@ urlpatterns = [
     #path('', views.login_view, name='login'),
     path('', RedirectView.as_view(pattern_name='junox:login_junox', permanent=False)),
     path('login_junox/', views.login_junox, name='login_junox'),
-    path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/', read_views.dashboard_view, name='dashboard'),
     path('logout/', views.logout_view, name='logout'),
     path('check_session/', views.check_session, name='check_session'),
-    path('device_detail/<int:device_id>/<str:hostname>/', views.device_detail_view, name='device_detail'),
-    path('device_dashboard/', views.device_dashboard_view, name='device_dashboard'),
+    path('session_status/', views.session_status, name='session_status'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('device_detail/<int:device_id>/<str:hostname>/', read_views.device_detail_view, name='device_detail'),
+    path('device_vlans/<int:device_id>/', read_views.device_vlans_view, name='device_vlans'),
+    path('device_dashboard/', read_views.device_dashboard_view, name='device_dashboard'),
     path('add_device/', views.add_device_view, name='add_device'),
-    path('jobs_list/', views.jobs_list_view, name='jobs_list'),
+    path('add_device/bulk/', async_views.bulk_add_device_view, name='bulk_add_device'),
+    path('device_logs/<uuid:session_id>/', async_views.device_log_stream_view, name='device_log_stream'),
+    path('jobs_list/', read_views.jobs_list_view, name='jobs_list'),
+    path('jobs/stream/', async_views.jobs_stream_view, name='jobs_stream'),
+    path('jobs/status/', views.jobs_status, name='jobs_status'),
     path('assign_vlan/', views.assign_vlan_view, name='assign_vlan'),
-    path('vlan_catalog/', views.vlan_catalog_view, name='vlan_catalog'),
+    path('assign_vlan/bulk/', views.bulk_assign_vlan_view, name='bulk_assign_vlan'),
+    path('vlan_catalog/', read_views.vlan_catalog_view, name='vlan_catalog'),
 ]
\ No newline at end of file
@@ -1,15 +1,46 @@
 from django.shortcuts import render,redirect
 from django.contrib import messages
-from django.core.paginator import Paginator
 import requests
 from .services import *
+from .api_client import api_get, api_post
+from .concurrency import gather
+from .pagination import PageWindow, page_number
+from .tokens import backend_accepts, store_auth_token, token_expiry
+import time
 from django.conf import settings
 from django.utils.safestring import mark_safe
 from functools import wraps
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.utils.http import quote_etag
+from .breaker import open_groups
+from .context_processors import api_version_info
+from . import job_stream, metrics
+import hashlib
+import hmac
+import json
+import logging
+import uuid
 
 API_URL = settings.API_URL
 
+logger = logging.getLogger(__name__)
+
+# device_detail: fetch the VLAN dropdown list from the browser (device_vlans_view)
+# instead of rendering it into the page
+DEVICE_VLANS_LAZY = getattr(settings, 'DEVICE_VLANS_LAZY', False)
+DEVICE_VLANS_MAX_AGE = getattr(settings, 'DEVICE_VLANS_MAX_AGE', 60)
+
+# Max assignments in one bulk_assign_vlan_view request
+BULK_ASSIGN_MAX_ITEMS = getattr(settings, 'BULK_ASSIGN_MAX_ITEMS', 200)
+
+# Bump to invalidate every page ETag (e.g. on a deploy that changes templates)
+PAGE_ETAG_SALT = getattr(settings, 'PAGE_ETAG_SALT', '')
+
+# Both False/smaller with signed-cookie sessions, see settings
+SESSION_KEEPS_REFRESH_TOKEN = getattr(settings, 'SESSION_KEEPS_REFRESH_TOKEN', True)
+SESSION_STARTED_JOBS = getattr(settings, 'SESSION_STARTED_JOBS', 64)
+
 #DECORATOR
 def token_required(view_func):
     @wraps(view_func)
@@ -21,6 +52,45 @@ def token_required(view_func):
     return _wrapped_view
 
 
+def _page_etag(request, version):
+    """
+    Strong validator for a page rendered from backend data `version`: the
+    data, the URL (search/sort/page), the user, the API badge and the
+    degraded-mode banner are all that change the HTML. None when the page
+    must be rendered anyway.
+    """
+    if version is None:
+        return None
+    if len(messages.get_messages(request)) or 'started_jobs' in request.session:
+        # Pending flash messages / job panels have to be rendered (and consumed)
+        return None
+
+    api_info = api_version_info(request)['api_info']
+    parts = (
+        PAGE_ETAG_SALT, version, request.get_full_path(), request.session.get('username'),
+        api_info.get('status'), api_info.get('version'), ','.join(open_groups()),
+    )
+    return quote_etag(hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest())
+
+
+def _render_conditional(request, template_name, context, version):
+    """
+    render() for pages built from backend data: answers 304 Not Modified,
+    before any template work, when the browser already has this page.
+    """
+    etag = _page_etag(request, version)
+    if etag is None:
+        return render(request, template_name, context)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render(request, template_name, context)
+    response['ETag'] = etag
+    # Browsers may keep the page but must revalidate it on every visit
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 #@token_required
 # def login_view(request):
 #     # If user has a token in their session, send them to dashboard
@@ -47,7 +117,7 @@ def login_junox(request):
 
         try:
             # 1. Post to FastAPI (Note: use 'data=' for form-data, not 'json=')
-            response = requests.post(API_URL + "/token", data=payload)
+            response = api_post(API_URL + "/token", data=payload)
             
             if response.status_code == 200:
                 # 2. Extract the token
@@ -57,8 +127,9 @@ def login_junox(request):
 
                 # 3. Store the token in a Django Session
                 # This keeps the user "logged in" across the dashboard
-                request.session['auth_token'] = token
-                request.session['refresh_token'] = refresh_token
+                store_auth_token(request.session, token)
+                if SESSION_KEEPS_REFRESH_TOKEN:
+                    request.session['refresh_token'] = refresh_token
                 request.session['username'] = username
                 
                 return redirect('junox:dashboard') # Redirect to dashboard
@@ -78,67 +149,54 @@ def login_junox(request):
 def device_dashboard_view(request):
     token = request.session.get('auth_token')
     
-    # 1. Get Search Query and Page Number
+    # 1. Get Search Query, Sort and Page Number
     search_query = request.GET.get('q', '').strip()
-    try:
-        current_page = int(request.GET.get('page', 1))
-    except (ValueError, TypeError):
-        current_page = 1
-    
+    sort = request.GET.get('sort', '').strip()
+    cursor = request.GET.get('cursor') or None
+    current_page = page_number(request)
+
     items_per_page = 15
-    all_devices = get_device_list(token)
-    
-    if all_devices is None:
-        return render(request, 'junox/device_dasboard.html', {'error': 'API Connection Error'})
-    
-    # 2. FILTERING LOGIC
-    # We filter the list based on hostname, IP, or Serial Number
-    if search_query:
-        all_devices = [
-            d for d in all_devices 
-            if search_query.lower() in str(d.get('hostname', '')).lower() 
-            or search_query.lower() in str(d.get('ip_address', '')).lower()
-            or search_query.lower() in str(d.get('serialnumber', '')).lower()
-            or search_query.lower() in str(d.get('model', '')).lower()
-        ]
-    
-    # 3. Calculate totals and bounds based on the (potentially filtered) list
-    total_count = len(all_devices)
-    last_page = (total_count + items_per_page - 1) // items_per_page if total_count > 0 else 1
+
+    # 2. FILTERING + PAGING: FastAPI (or the service fallback) hands back just this page
+    page_data = get_device_page(token, search=search_query, sort=sort, cursor=cursor,
+                                offset=(current_page - 1) * items_per_page, limit=items_per_page)
     
-    # Safety check
-    if current_page > last_page: current_page = last_page
-    if current_page < 1: current_page = 1
-
-    # 4. Slice the list for the current page
-    start = (current_page - 1) * items_per_page
-    end = start + items_per_page
-    device_list = all_devices[start:end]
+    if page_data is None:
+        return _render_device_dashboard(request, None, None, search_query, sort)
     
-    page_numbers_all = []
-    for p in range(1, last_page + 1):
-        page_numbers_all.append({
-            'num': p,
-            'status': 'selected' if p == current_page else ''
-        })
+    # 3. Work out the page window from the (potentially filtered) total
+    page = _device_page_window(request, page_data, current_page, items_per_page)
+    if page.number != current_page and not page.is_cursor:
+        # Asked past the end (e.g. stale link after filtering), fetch the last page instead
+        page_data = get_device_page(token, search=search_query, sort=sort,
+                                    offset=page.offset, limit=items_per_page) or page_data
+
+    return _render_device_dashboard(request, page_data, page, search_query, sort)
+
+
+def _device_page_window(request, page_data, current_page, items_per_page):
+    if page_data['total'] is None:
+        # Cursor-paged backend: no total, just next/prev
+        return PageWindow.cursor(request, items_per_page,
+                                 next_cursor=page_data.get('next_cursor'),
+                                 prev_cursor=page_data.get('prev_cursor'))
+    return PageWindow(request, items_per_page, number=current_page, total=page_data['total'])
 
-    # SLIDING WINDOW FOR BUTTONS
-    page_range = [p for p in range(current_page - 2, current_page + 3) if 0 < p <= last_page]
+
+def _render_device_dashboard(request, page_data, page, search_query, sort):
+    # Shared with the async view: everything after the backend calls
+    if page_data is None:
+        return render(request, 'junox/device_dasboard.html', {'error': 'API Connection Error'})
 
     context = {
-        'device_list': device_list,
-        'total_count': total_count,
-        'current_page': current_page,
-        'last_page': last_page,
-        'has_next': current_page < last_page,
-        'has_prev': current_page > 1,
-        'next_page': current_page + 1,
-        'prev_page': current_page - 1,
-        'page_range': page_range,
-        'page_numbers_all': page_numbers_all,
+        'device_list': page_data['devices'],
+        'total_count': page_data['total'],
+        'page': page,
         'search_query': search_query, # Pass this back to keep the input filled
+        'current_sort': sort,
+        'data_version': page_data['version'], # Keys the cached device table
     }
-    return render(request, 'junox/device_dasboard.html', context)
+    return _render_conditional(request, 'junox/device_dasboard.html', context, page_data['version'])
 
 
 @token_required
@@ -148,32 +206,121 @@ def assign_vlan_view(request):
     if request.method == 'POST':
         interface_name = request.POST.get('interface_name')
         hostname = request.POST.get('hostname')
-        vlan_id = request.POST.get('vlan_id')
+        # device_detail posts one form for all rows: the clicked row's button
+        # names the interface and its dropdown is vlan_<interface>
+        vlan_id = request.POST.get(f'vlan_{interface_name}') or request.POST.get('vlan_id')
         device_id = request.POST.get('device_id')
+
+        # Both go into the backend URL, and device_id and hostname into the redirect
+        if not (device_id or '').isdigit() or not (vlan_id or '').isdigit() or not hostname or '/' in hostname:
+            return HttpResponseBadRequest("device_id, vlan_id and hostname are required")
         
         result = service_assign_vlan(token, device_id, interface_name, vlan_id)
 
 
         
         if result.get("success"):
-            job_id = result["data"]["job_id"]
-            messages.success(request, f"Job ID: {job_id} assigned to {interface_name} on {hostname}")
+            # Any 200 counts as assigned, even a body without a job id
+            job_id = result["job_id"]
+            _remember_started_job(request, job_id)
+            if job_id:
+                messages.success(request, f"Job ID: {job_id} assigned to {interface_name} on {hostname}")
+            else:
+                messages.success(request, f"VLAN {vlan_id} assigned to {interface_name} on {hostname}")
             return redirect('junox:device_detail', device_id=device_id, hostname=hostname)
         else:
             messages.error(request, result["error"])
             return redirect('junox:device_detail', device_id=device_id, hostname=hostname)
 
 
+@token_required
+def bulk_assign_vlan_view(request):
+    """
+    Assigns VLANs to many interfaces in one request.
+
+    The device_detail form posts the checked interfaces of one device and a
+    single VLAN, and gets redirected back with a summary. A JSON post of
+    {"assignments": [{"device_id", "interface_name", "vlan_id"}, ...]} may
+    span devices and gets the per-item results back.
+    """
+    if request.method != 'POST':
+        return redirect('junox:device_dashboard')
+
+    token = request.session.get('auth_token')
+
+    if request.content_type == 'application/json':
+        try:
+            assignments = _bulk_assignments(json.loads(request.body).get('assignments'))
+        except (ValueError, AttributeError) as e:
+            return JsonResponse({'error': f"Invalid assignments: {e}"}, status=400)
+
+        results = service_assign_vlans_bulk(token, assignments)
+        _remember_started_job(request, *(result['job_id'] for result in results if result['success']))
+        succeeded = sum(1 for result in results if result['success'])
+        return JsonResponse({'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded})
+
+    device_id = request.POST.get('device_id')
+    hostname = request.POST.get('hostname')
+    vlan_id = request.POST.get('bulk_vlan_id')
+    interfaces = request.POST.getlist('interfaces')
+
+    # Both go into the redirect back to device_detail
+    if not (device_id or '').isdigit() or not hostname or '/' in hostname:
+        return HttpResponseBadRequest("device_id and hostname are required")
+
+    if not vlan_id or not interfaces:
+        messages.error(request, "Select one or more interfaces and a VLAN first.")
+    elif len(interfaces) > BULK_ASSIGN_MAX_ITEMS:
+        messages.error(request, f"At most {BULK_ASSIGN_MAX_ITEMS} interfaces can be changed at once.")
+    else:
+        results = service_assign_vlans_bulk(token, [
+            {'device_id': device_id, 'interface_name': name, 'vlan_id': vlan_id} for name in interfaces
+        ])
+        done = [result for result in results if result['success']]
+        failed = [result for result in results if not result['success']]
+
+        if done:
+            _remember_started_job(request, *(result['job_id'] for result in done))
+            messages.success(request, f"VLAN {vlan_id} assigned to {len(done)} interface(s) on {hostname}")
+        if failed:
+            details = ", ".join(f"{result['interface_name']} ({result['error']})" for result in failed)
+            messages.error(request, f"VLAN {vlan_id} failed on {len(failed)} interface(s): {details}")
+
+    return redirect('junox:device_detail', device_id=device_id, hostname=hostname)
+
+
+def _bulk_assignments(items):
+    # Validates the JSON body of a bulk assignment
+    if not isinstance(items, list) or not items:
+        raise ValueError("expected a non-empty list")
+    if len(items) > BULK_ASSIGN_MAX_ITEMS:
+        raise ValueError(f"at most {BULK_ASSIGN_MAX_ITEMS} per request")
+
+    assignments = []
+    for item in items:
+        if not all(item.get(key) not in (None, '') for key in ('device_id', 'interface_name', 'vlan_id')):
+            raise ValueError("each needs device_id, interface_name and vlan_id")
+        # Both end up in the backend URL
+        if not (str(item['device_id']).isdigit() and str(item['vlan_id']).isdigit()):
+            raise ValueError("device_id and vlan_id must be numbers")
+        assignments.append({key: str(item[key]) for key in ('device_id', 'interface_name', 'vlan_id')})
+    return assignments
+
+
 @token_required
 def vlan_catalog_view(request):
     token = request.session.get('auth_token')
     
     result = service_get_vlan_catalog(token)
+    return _render_vlan_catalog(request, result)
+
+
+def _render_vlan_catalog(request, result):
     if not result.get("success"):
         messages.error(request, result["error"])
         return redirect('junox:dashboard')
     
-    return render(request, 'junox/vlan_catalog.html', {'catalog': result['vlans']})
+    return _render_conditional(request, 'junox/vlan_catalog.html', {'catalog': result['vlans']}, result['version'])
 
 
 @token_required
@@ -181,21 +328,59 @@ def device_detail_view(request, device_id, hostname):
 
     token = request.session.get('auth_token')
     
-    interfaces = get_device_interfaces(token, device_id)
-    vlans = service_get_device_vlans(token, device_id)
+    if DEVICE_VLANS_LAZY:
+        # The page's script fetches the VLAN list from device_vlans_view
+        interfaces = get_device_interfaces(token, device_id)
+        return _render_device_detail(request, device_id, hostname, interfaces, None)
+
+    # Both lookups hit the backend independently, so run them side by side
+    results = gather({
+        'interfaces': (get_device_interfaces, token, device_id),
+        'vlans': (service_get_device_vlans, token, device_id),
+    })
+    return _render_device_detail(request, device_id, hostname, results['interfaces'], results['vlans'])
 
 
+def _render_device_detail(request, device_id, hostname, interfaces, vlans):
     if not interfaces:
         return render(request, 'junox/device_detail.html', {'error': 'API Connection Error'})
+
+    if vlans is None and not DEVICE_VLANS_LAZY:
+        # Interfaces still render, only the VLAN dropdowns come up empty
+        messages.error(request, "VLAN list is currently unavailable.")
     
+    # The VLAN options are rendered once per page (a <template> the rows
+    # copy from), not once per interface
     return render(request, 'junox/device_detail.html', {
                'device_interfaces': interfaces['interfaces'],
                'hostname':hostname,
                'vlan_list': vlans,
+               'vlans_lazy': DEVICE_VLANS_LAZY,
                'device_id': device_id,
+               'data_version': interfaces.get('version'),
                })
 
 
+@token_required
+def device_vlans_view(request, device_id):
+    """The device's VLANs as JSON, for the device_detail dropdowns."""
+    token = request.session.get('auth_token')
+    return _device_vlans_response(request, service_get_device_vlans(token, device_id))
+
+
+def _device_vlans_response(request, vlans):
+    if vlans is None:
+        return JsonResponse({'error': 'VLAN list is currently unavailable.'}, status=502)
+
+    response = JsonResponse({'vlans': [
+        {'vlan_id': vlan.get('vlan_id'), 'vlan_name': vlan.get('vlan_name')} for vlan in vlans
+    ]})
+    # Browsers reuse it for a minute, then revalidate against the ETag
+    patch_cache_control(response, private=True, max_age=DEVICE_VLANS_MAX_AGE)
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
 @token_required
 def add_device_view(request):
     token = request.session.get('auth_token')
@@ -217,9 +402,10 @@ def add_device_view(request):
         if result["success"]:
             if is_ajax:
                 # Return JSON to keep the page still and terminal open
-                return JsonResponse({"status": "processing", "job_id": result["data"].get('job_id')})
+                return JsonResponse({"status": "processing", "job_id": result["job_id"]})
             
             # Standard flow: Redirect to dashboard
+            _remember_started_job(request, result["job_id"])
             messages.success(request, f"Device {hostname} registration initiated.")
             return redirect('junox:device_dashboard')
         else:
@@ -229,49 +415,137 @@ def add_device_view(request):
             
             messages.error(request, result["error"])
 
-    return render(request, 'junox/add_device.html', {'session_id': session_id})
+    return render(request, 'junox/add_device.html', {
+        'session_id': session_id,
+        'log_session_id': _issue_log_session(request),
+    })
+
+
+def _remember_started_job(request, *job_ids):
+    """The next page shows these jobs' live status (context_processors.started_jobs)."""
+    job_ids = [str(job_id) for job_id in job_ids if job_id]
+    if job_ids:
+        # 64: one bulk assignment of a 48-port switch, with room to spare
+        request.session['started_jobs'] = (request.session.get('started_jobs', []) + job_ids)[-SESSION_STARTED_JOBS:]
+
+
+def _issue_log_session(request):
+    """
+    A new debug-log session id for the add_device page. Only ids issued to
+    this browser session can be streamed (async_views.device_log_stream_view).
+    """
+    log_session_id = str(uuid.uuid4())
+    # The last few are enough for a handful of open add_device tabs
+    request.session['log_sessions'] = request.session.get('log_sessions', [])[-4:] + [log_session_id]
+    return log_session_id
 
 @token_required
 def jobs_list_view(request):
     token = request.session.get('auth_token')
 
-    result = service_get_all_jobs(token)
-    all_jobs = result.get('jobs', [])
-
-    # 1. SEARCH LOGIC
+    # 1. SEARCH + SORT PARAMETERS
     search_query = request.GET.get('q', '').lower()
-    if search_query:
-        all_jobs = [
-            j for j in all_jobs 
-            if search_query in str(j.get('id', '')).lower() 
-            or search_query in str(j.get('target', '')).lower()
-        ]
-
-    # 2. SORT LOGIC
     sort_by = request.GET.get('sort', 'created_at') # Default sort
-    reverse_sort = request.GET.get('order', 'desc') == 'desc'
-    
-    try:
-        all_jobs.sort(key=lambda x: x.get(sort_by) or '', reverse=reverse_sort)
-    except Exception:
-        pass # Fallback if field missing
+    order = request.GET.get('order', 'desc')
+
+    # 2. FETCH ONLY THE PAGE WE SHOW (FastAPI or the service fallback filters and sorts)
+    items_per_page = 15
+    current_page = page_number(request)
+    result = service_get_jobs_page(token, search=search_query, sort=sort_by, order=order,
+                                   offset=(current_page - 1) * items_per_page, limit=items_per_page)
 
     # 3. PAGINATION
-    paginator = Paginator(all_jobs, 15)
-    page_obj = paginator.get_page(request.GET.get('page', 1))
+    page = PageWindow(request, items_per_page, number=current_page, total=result.get('total', 0))
+    if result.get('success') and page.number != current_page:
+        # Past the last page: show the last one instead
+        result = service_get_jobs_page(token, search=search_query, sort=sort_by, order=order,
+                                       offset=page.offset, limit=items_per_page)
+
+    return _render_jobs_list(request, result, page, search_query, sort_by, order)
+
 
-    return render(request, 'junox/jobs_list.html', {
-        'jobs': page_obj,
+def _render_jobs_list(request, result, page, search_query, sort_by, order):
+    context = {
+        'jobs': result.get('jobs', []),
+        'page': page,
         'search_query': search_query,
         'current_sort': sort_by,
-        'current_order': request.GET.get('order', 'desc')
-    })
+        'current_order': order,
+        'data_version': result.get('version'),
+        'jobs_cursor': result.get('cursor'), # Live updates start after this
+    }
+    return _render_conditional(request, 'junox/jobs_list.html', context, result.get('version'))
     
 
+@token_required
+def jobs_status(request):
+    """
+    Job watcher for WSGI deployments, polled by the pages instead of the
+    jobs_stream event stream: the current state of the jobs in ?ids=a,b and
+    of those changed after ?since=<cursor>, plus the cursor for the next poll.
+    """
+    ids, since = job_stream.job_query(request)
+    if not ids and since is None:
+        return HttpResponseBadRequest("Pass ids and/or since")
+
+    result = service_get_job_changes(request.session.get('auth_token'), ids, since)
+    if not result['success']:
+        return JsonResponse({'error': result['error']}, status=502)
+
+    response = JsonResponse(job_stream.job_snapshot(result['jobs'], ids, since))
+    patch_cache_control(response, no_store=True)
+    return response
+
+
 def logout_view(request):
     request.session.flush() # Completely destroys the session and cookies
     return redirect('junox:login_junox')
 
+def session_status(request):
+    """
+    Polled by every open tab (base.html): 200 while the session's token is
+    usable, 401 once it isn't. Answers from the token's known expiry and a
+    briefly cached /ping, and never renders a page.
+    """
+    token = request.session.get('auth_token')
+    expires_at = request.session.get('auth_token_exp')
+    if token and expires_at is None:
+        expires_at = token_expiry(token) or False
+
+    # The middleware has already refreshed a token that was about to expire,
+    # so an expired one here means the refresh failed
+    valid = bool(token) and not (expires_at and expires_at <= time.time())
+    if valid and backend_accepts(token) is False:
+        valid = False
+
+    if not valid:
+        response = JsonResponse({'authenticated': False}, status=401)
+    else:
+        response = JsonResponse({
+            'authenticated': True,
+            'expires_in': int(expires_at - time.time()) if expires_at else None,
+        })
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+def metrics_view(request):
+    """
+    This worker's request, render, backend, cache and token metrics, for Prometheus.
+    Off (404) until METRICS_TOKEN is set: they list every backend endpoint.
+    """
+    expected = getattr(settings, 'METRICS_TOKEN', None)
+    if not expected:
+        return HttpResponse(status=404)
+    sent = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(sent.encode(), f'Bearer {expected}'.encode()):
+        return HttpResponse(status=401)
+
+    response = HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
+
+
 @token_required
 def check_session(request):
     """We check if the user still has a valid session"""
@@ -280,7 +554,7 @@ def check_session(request):
     token = request.session.get('auth_token')
     
     try:
-        response = requests.get(API_URL + "/ping", headers={'Authorization': f'Bearer {token}'})
+        response = api_get(API_URL + "/ping", token=token)
         if response.status_code == 200:
             return redirect('junox:dashboard')
         else:
@@ -291,25 +565,25 @@ def check_session(request):
 @token_required
 def dashboard_view(request):
     # 1. Fetch aggregated data from FastAPI
-    # Ensure this URL matches your internal docker/local network address
     token = request.session.get('auth_token')
-    api_url = f"{settings.API_URL}/devices/inventory/stats"
-    headers = {"Authorization": f"Bearer {token}"}
-    
+
+    # 2. Get the data (the service uses a short timeout so the dashboard doesn't hang if API is down)
+    result = service_get_inventory_stats(token)
+    return _render_dashboard(request, result)
+
+
+def _render_dashboard(request, result):
     context = {
-        "stats": {}
+        "stats": {},
+        "data_version": None,
     }
 
-    try:
-        # 2. Get the data (set a timeout so the dashboard doesn't hang if API is down)
-        response = requests.get(api_url, timeout=3, headers=headers)
-        if response.status_code == 200:
-            context["stats"] = response.json()
-        else:
-            print(f"Error fetching stats: {response.status_code}")
-    except Exception as e:
-        print(f"API Connection Error: {e}")
+    if result["success"]:
+        context["stats"] = result["stats"]
+        context["data_version"] = result["version"]
+    else:
         # We pass empty stats so the page loads (just without charts)
+        logger.warning("Dashboard stats unavailable: %s", result["error"])
 
-    return render(request, 'junox/dashboard.html', context)
+    return _render_conditional(request, 'junox/dashboard.html', context, context["data_version"])
 
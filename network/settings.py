@@ -19,6 +19,136 @@ API_ROOT = "http://127.0.0.1:8000" # For Metadata/OpenAPI
 API_URL = f"{API_ROOT}/api/v1"      # For Functional Calls
 JUNOX_FRONTEND_URL = "http://127.0.0.1:8001"
 
+# Backend HTTP client (junox/api_client.py)
+API_POOL_CONNECTIONS = int(os.getenv("API_POOL_CONNECTIONS", 10))  # Distinct hosts kept pooled
+API_POOL_MAXSIZE = int(os.getenv("API_POOL_MAXSIZE", 20))          # Keep-alive sockets per host, per worker
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", 2))   # Seconds
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", 10))        # Seconds, when a call doesn't set its own
+API_GET_RETRIES = int(os.getenv("API_GET_RETRIES", 2))             # GETs only, writes are never retried
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", 0.2))     # Seconds, doubled per retry
+
+# Concurrent backend calls within one view (junox/concurrency.py)
+JUNOX_FANOUT_WORKERS = int(os.getenv("JUNOX_FANOUT_WORKERS", 16))  # Threads shared by all requests in a worker
+JUNOX_FANOUT_TIMEOUT = float(os.getenv("JUNOX_FANOUT_TIMEOUT", 15)) # Seconds before a slow call is dropped
+
+# Serve the read-heavy pages from async views with an async backend client
+# (needs an ASGI server such as uvicorn; httpx is used when installed)
+JUNOX_ASYNC_VIEWS = os.getenv("JUNOX_ASYNC_VIEWS", "false").lower() in ("1", "true", "yes")
+
+# Device detail VLAN dropdowns: fetch the list from the browser (cached there for
+# DEVICE_VLANS_MAX_AGE seconds) instead of rendering it into the page
+DEVICE_VLANS_LAZY = os.getenv("DEVICE_VLANS_LAZY", "false").lower() in ("1", "true", "yes")
+DEVICE_VLANS_MAX_AGE = int(os.getenv("DEVICE_VLANS_MAX_AGE", 60))
+
+# add_device live logs (junox/log_relay.py): FastAPI's log WebSocket, relayed to
+# the browser as Server-Sent Events (needs the websockets package)
+API_WS_ROOT = os.getenv("API_WS_ROOT", API_ROOT.replace("http", "ws", 1))
+LOG_RELAY_QUEUE_LINES = 200   # Lines buffered per stream before reading from the backend pauses
+LOG_RELAY_BATCH_LINES = 50    # Max lines per SSE frame
+LOG_RELAY_BATCH_WINDOW = 0.05 # Seconds to wait for more lines before sending a frame
+LOG_RELAY_MAX_SECONDS = 900   # Streams are closed after this long
+SSE_KEEPALIVE_SECONDS = 15    # Seconds between keep-alive comments on any idle event stream
+
+# Live job status (junox/job_stream.py): under ASGI an event stream asks for the watched jobs
+# every JOB_STREAM_POLL_SECONDS; under WSGI (where a stream would hold a worker thread) the
+# pages poll every JOB_POLL_SECONDS instead. Both give up after JOB_STREAM_MAX_SECONDS.
+JOB_STREAM_POLL_SECONDS = 3
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 5))
+JOB_STREAM_MAX_SECONDS = 900
+# True if FastAPI's /other/jobs/all honours ids=<a,b> and since=<epoch seconds>, False to always
+# read the whole (cached) history, "auto" to find out from the first filtered response
+API_JOBS_FILTERING = os.getenv("API_JOBS_FILTERING", "auto")
+
+# Bulk VLAN assignment: concurrent backend calls per request, and max interfaces per request
+API_BULK_CONCURRENCY = int(os.getenv("API_BULK_CONCURRENCY", 8))
+BULK_ASSIGN_MAX_ITEMS = int(os.getenv("BULK_ASSIGN_MAX_ITEMS", 200))
+
+# Bulk device import (junox/bulk_import.py): provisioning calls in flight per import,
+# submissions per second (0 for no limit) and rows read per import
+BULK_PROVISION_WORKERS = int(os.getenv("BULK_PROVISION_WORKERS", 4))
+BULK_PROVISION_RATE = float(os.getenv("BULK_PROVISION_RATE", 5))
+BULK_PROVISION_MAX_ROWS = int(os.getenv("BULK_PROVISION_MAX_ROWS", 5000))
+
+# Backend status badge (junox/context_processors.py), refreshed in the background
+API_HEALTH_TTL = float(os.getenv("API_HEALTH_TTL", 30))         # Seconds a /health result is served before re-checking
+API_HEALTH_TIMEOUT = float(os.getenv("API_HEALTH_TIMEOUT", 0.5)) # Seconds
+API_HEALTH_CACHE_ALIAS = os.getenv("API_HEALTH_CACHE_ALIAS")      # Optional CACHES alias to share the result across workers
+API_HEALTH_OFFLINE_INFO = {"version": "Offline", "title": "JunoX API", "status": "offline"}
+
+# Inventory/jobs paging: True if FastAPI's /devices honours search/offset/limit/sort,
+# False to always page locally, "auto" to detect it from the first response
+API_DEVICES_SERVER_PAGING = os.getenv("API_DEVICES_SERVER_PAGING", "auto")
+API_JOBS_SERVER_PAGING = os.getenv("API_JOBS_SERVER_PAGING", "auto")  # Same, for /other/jobs/all
+
+# Backend response cache (junox/api_cache.py): seconds each endpoint group is served
+# from cache. Groups left out (or 0) always go to FastAPI.
+API_CACHE_TTLS = {
+    "devices": 30,
+    "stats": 30,
+    "vlan_catalog": 300,
+    "jobs": 10,
+    # Live job watchers (job_stream, jobs_status): at or below JOB_STREAM_POLL_SECONDS so every
+    # tick sees the current state; only collapses watchers asking at the same moment
+    "job_changes": 1,
+    # device_detail: short, VLAN assignments invalidate them anyway. Cached mostly so the page
+    # can be served from the last known state while the backend is unavailable
+    "interfaces": 10,
+    "device_vlans": 10,
+}
+API_CACHE_STALE_SECONDS = 600  # Expired entries kept this long for ETag revalidation
+
+# Cache warming (junox/cache_warmer.py): a service account refetches the shared groups before
+# they expire. `manage.py warm_cache` pre-warms once (at deploy time) or, with --loop, runs as its
+# own scheduler; CACHE_WARM_IN_PROCESS runs the same loop in a thread of each web worker instead.
+JUNOX_SERVICE_USERNAME = os.getenv("JUNOX_SERVICE_USERNAME")
+JUNOX_SERVICE_PASSWORD = os.getenv("JUNOX_SERVICE_PASSWORD")
+# Opt-in: groups whose data is the same for every user, cached once for all of them instead of
+# once per user. A shared entry is served without FastAPI seeing the session's token, so only list
+# groups FastAPI doesn't filter or authorize per user (e.g. "stats,devices,vlan_catalog").
+# Ignored unless the service account above is set.
+API_CACHE_SHARED_GROUPS = [g.strip() for g in os.getenv("API_CACHE_SHARED_GROUPS", "").split(",") if g.strip()]
+CACHE_WARM_IN_PROCESS = os.getenv("CACHE_WARM_IN_PROCESS", "false").lower() in ("1", "true", "yes")
+CACHE_WARM_INTERVAL = float(os.getenv("CACHE_WARM_INTERVAL", 20))  # Seconds; keep it under the TTLs above
+CACHE_WARM_JITTER = float(os.getenv("CACHE_WARM_JITTER", 0.2))    # Each wait is the interval +/- this fraction
+
+# Circuit breaker per backend endpoint group (junox/breaker.py): after BREAKER_FAILURES
+# failed calls in a row the group fails fast for BREAKER_RESET_SECONDS, then one probe
+# call decides whether it closes again
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", 30))
+
+# Response size (junox/compression.py), both off by default. JUNOX_HTML_MINIFY strips the
+# templates' indentation; JUNOX_COMPRESS gzips (or, with the brotli package, brotlis) responses
+# of at least COMPRESS_MIN_BYTES. Event streams are never touched. `manage.py page_bytes`
+# measures the effect.
+JUNOX_HTML_MINIFY = os.getenv("JUNOX_HTML_MINIFY", "false").lower() in ("1", "true", "yes")
+JUNOX_COMPRESS = os.getenv("JUNOX_COMPRESS", "false").lower() in ("1", "true", "yes")
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+COMPRESS_BROTLI_QUALITY = 5  # 0-11; 5 compresses about as fast as gzip, and smaller
+
+# Instrumentation (junox/metrics.py): per-request Server-Timing header, and the
+# Prometheus endpoint at /junox/metrics/: off until METRICS_TOKEN is set, then the scraper
+# has to send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Token refresh (junox/tokens.py)
+API_REFRESH_TIMEOUT = float(os.getenv("API_REFRESH_TIMEOUT", 3))                  # Seconds
+TOKEN_REFRESH_CACHE_SECONDS = int(os.getenv("TOKEN_REFRESH_CACHE_SECONDS", 30))  # Reuse a refreshed token for bursts
+TOKEN_REFRESH_WINDOW_SECONDS = 5 * 60  # Refresh once the access token expires in less than this
+# Session-status poll (junox/views.session_status): how long FastAPI's verdict on a token is reused
+SESSION_PING_CACHE_SECONDS = int(os.getenv("SESSION_PING_CACHE_SECONDS", 60))
+SESSION_PING_TIMEOUT = float(os.getenv("SESSION_PING_TIMEOUT", 2))  # Seconds
+# Path prefixes where the middleware doesn't touch the session or the token at all
+TOKEN_REFRESH_EXEMPT_PATHS = [
+    "/static/",
+    "/favicon.ico",
+    "/admin/",
+    "/junox/login_junox/",
+    "/junox/metrics/",
+    "/junox/logout/",
+]
+
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,7 +162,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-^k*2c+mfnr5%2yg@^rp6gp!0$xur_=$d7sck8455vmx!lao9-2'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DJANGO_DEBUG=false also makes {% static %} render the hashed names (JUNOX_HASHED_STATIC)
+DEBUG = os.getenv("DJANGO_DEBUG", "true").lower() in ("1", "true", "yes")
 
 ALLOWED_HOSTS = [
  "junox.rtodto.net",
@@ -56,6 +187,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'junox.metrics.MetricsMiddleware', # First, so its timings include the rest
+    'junox.compression.CompressionMiddleware', # Skipped unless JUNOX_HTML_MINIFY/JUNOX_COMPRESS
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,10 +203,19 @@ ROOT_URLCONF = 'network.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's engine, with render times recorded (junox/metrics.py)
+        'BACKEND': 'junox.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
+        'APP_DIRS': False,
         'OPTIONS': {
+            # Templates are parsed once per process, in DEBUG too (runserver's
+            # autoreloader still picks up template edits)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -81,6 +223,10 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 #MY CUSTOM CONTEXT PROCESSOR
                 'junox.context_processors.api_version_info',
+                'junox.context_processors.fragment_cache',
+                'junox.context_processors.started_jobs',
+                'junox.context_processors.job_watch',
+                'junox.context_processors.backend_breakers',
             ],
         },
     },
@@ -100,6 +246,28 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default; use FileBasedCache (or Redis) to share between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'junox'),
+    }
+}
+
+
+# Seconds a rendered {% cache %} fragment (device/interface/jobs tables, dashboard
+# charts) is kept; fragments are keyed on the backend data version, so new data
+# renders fresh regardless
+TEMPLATE_FRAGMENT_TTL = int(os.getenv("TEMPLATE_FRAGMENT_TTL", 600))
+
+# Pages built from backend data carry an ETag and answer 304 when unchanged;
+# change this on deploys that alter templates so browsers re-fetch
+PAGE_ETAG_SALT = os.getenv("PAGE_ETAG_SALT", "")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -140,6 +308,20 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# Cache-friendly static assets (junox/static_assets.py). JUNOX_HASHED_STATIC: collectstatic
+# writes content-hashed names plus .gz/.br copies; run collectstatic before starting with it on.
+# {% static %} only renders the hashed names with DJANGO_DEBUG=false. JUNOX_SERVE_STATIC: Django
+# serves STATIC_ROOT itself, precompressed and cached as immutable, when there's no nginx in front.
+JUNOX_HASHED_STATIC = os.getenv("JUNOX_HASHED_STATIC", "false").lower() in ("1", "true", "yes")
+JUNOX_SERVE_STATIC = os.getenv("JUNOX_SERVE_STATIC", "false").lower() in ("1", "true", "yes")
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "junox.static_assets.CompressedManifestStaticFilesStorage" if JUNOX_HASHED_STATIC
+        else "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -148,3 +330,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SESSION_COOKIE_AGE = 1800
 
+# Where sessions (and with them the access/refresh tokens and the token's expiry) live:
+#   "db"             - Django's default table: a SQLite read per request, a write per token refresh
+#   "cache"          - CACHES only; use a shared backend (Redis, Memcached) with more than one worker
+#   "cached_db"      - the cache in front of the table
+#   "signed_cookies" - the browser's cookie, signed with SECRET_KEY; no server-side storage at all
+# With "cache" or "signed_cookies" requests never touch the database (only /admin/ does).
+# Either way a session is only saved when it changes: login, a new token, a new job panel.
+JUNOX_SESSION_STORE = os.getenv("JUNOX_SESSION_STORE", "db")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{JUNOX_SESSION_STORE}"
+SESSION_CACHE_ALIAS = os.getenv("SESSION_CACHE_ALIAS", "default")
+# A signed cookie is readable in the browser and capped at 4 KB: it never holds the refresh
+# token (the user logs in again when the access token expires) and remembers fewer jobs
+SESSION_KEEPS_REFRESH_TOKEN = JUNOX_SESSION_STORE != "signed_cookies"
+SESSION_STARTED_JOBS = 64 if SESSION_KEEPS_REFRESH_TOKEN else 8  # Job ids kept for the next page's job panel
+
@@ -14,10 +14,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.urls import include
+
+from junox import static_assets
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('junox/', include('junox.urls')),
 ]
+
+if settings.JUNOX_SERVE_STATIC:
+    # Collected assets straight from STATIC_ROOT (runserver serves them itself in DEBUG)
+    urlpatterns.append(
+        re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), static_assets.serve))